@@ -0,0 +1,39 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Hashable
+
+
+@dataclass
+class TTLCache[K: Hashable, V]:
+    "Bounded in-process LRU cache with per entry time to live"
+
+    maxsize: int
+    ttl: float
+    _data: OrderedDict[K, tuple[V, float]] = field(
+        default_factory=OrderedDict,
+        init=False,
+    )
+
+    def get(self, key: K) -> V | None:
+        if (item := self._data.get(key)) is None:
+            return None
+        value, expire_at = item
+        if expire_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            # evict the least recently used
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
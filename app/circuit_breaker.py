@@ -0,0 +1,34 @@
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class CircuitBreaker:
+    "Stops calling a failing dependency until a cooldown passes"
+
+    failure_threshold: int
+    reset_timeout: float
+    failures: int = field(default=0, init=False)
+    opened_at: float | None = field(default=None, init=False)
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow_request(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        # half open, one probe per cooldown
+        self.opened_at = time.monotonic()
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
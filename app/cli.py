@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+from typing import Annotated
+
+import typer
+
+from app.config import Settings, get_settings
+from app.ioc import setup_container
+from app.src.delivery.services.parcels_service import ParcelService
+from app.src.delivery.services.worker_service import BackgroundWorkerService
+
+logger = logging.getLogger(__name__)
+
+cli = typer.Typer(help="Delivery service maintenance jobs")
+
+
+def init_container(settings: Settings):
+    return setup_container(
+        context={
+            Settings: settings,
+            logging.Logger: logger,
+        },
+    )
+
+
+async def reprice(settings: Settings, chunk_size: int, *, only_missing: bool):
+    container = init_container(settings)
+    try:
+        async with container() as request_container:
+            parcel_service = await request_container.get(ParcelService)
+            started = time.perf_counter()
+            repriced = await parcel_service.reprice_parcels(
+                chunk_size,
+                only_missing=only_missing,
+            )
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "%s parcels repriced in %.2fs, %.0f rows/s",
+            repriced,
+            elapsed,
+            repriced / elapsed if elapsed else 0,
+        )
+    finally:
+        await container.close()
+
+
+async def replay(settings: Settings, limit: int):
+    container = init_container(settings)
+    try:
+        worker_service = await container.get(BackgroundWorkerService)
+        try:
+            replayed = await worker_service.replay_dead_letters(limit)
+        finally:
+            await worker_service.close()
+        logger.info("%s dead-lettered parcels replayed", replayed)
+    finally:
+        await container.close()
+
+
+@cli.callback()
+def main():
+    "Runs a job with the app container"
+
+
+@cli.command()
+def reprice_parcels(
+    *,
+    chunk_size: Annotated[int, typer.Option(min=1)] = 1000,
+    reprice_all: Annotated[
+        bool,
+        typer.Option("--all", help="Reprice parcels with a price too"),
+    ] = False,
+):
+    "Calculates delivery prices of parcels in bulk"
+    asyncio.run(
+        reprice(get_settings(), chunk_size, only_missing=not reprice_all),
+    )
+
+
+@cli.command()
+def replay_dead_letters(
+    limit: Annotated[int, typer.Option(min=1)] = 1000,
+):
+    "Moves dead-lettered parcel messages back to the queue"
+    asyncio.run(replay(get_settings(), limit))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    cli()
@@ -13,22 +13,66 @@ class Settings(BaseSettings):
     api_version: int = Field(default=1)
     debug: bool = Field(default=True)
     init_db: bool = Field(default=False)
+    # consume the queue inside the web app, see app.worker
+    in_app_worker: bool = True
     # rabbit
     rabbitmq_host: str = "rabbitmq"
     rabbitmq_port: int = 5672
     rabbitmq_user: str = "guest"
     rabbitmq_password: str = "guest"
     queue_name: str = "delivery"
+    rabbitmq_publisher_channels: int = 10
+    # wait for broker confirms, max unconfirmed messages, seconds
+    rabbitmq_publisher_confirms: bool = True
+    rabbitmq_max_in_flight: int = 1000
+    rabbitmq_confirm_timeout: float = 5
+    # background worker, concurrent handlers and throughput log interval
+    worker_prefetch_count: int = 50
+    worker_concurrency: int = 20
+    worker_report_interval: float = 60
+    # micro-batching, 0 handles messages one by one
+    # keep prefetch at two batches or more, the next one fills meanwhile
+    worker_batch_size: int = 0
+    worker_batch_timeout_ms: int = 50
+    # retries with exponential backoff, then the dead letter queue
+    # retry queues are declared with these, delete them after a change
+    worker_max_attempts: int = 5
+    worker_retry_delay_ms: int = 1000
 
     # db
     db_host: str = "db"
     mysql_database: str = "delivery"
     mysql_user: str = "user"
     mysql_password: str = "password"
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
     # redis
     redis_host: str = "redis"
     redis_port: int = 6379
     redis_db: int = 0
+    # in-process exchange rates cache
+    rates_local_cache_size: int = 256
+    rates_local_cache_ttl: int = 300
+    # in-process cache of provisioned user ids
+    users_cache_size: int = 10000
+    users_cache_ttl: int = 3600
+    # central bank client, seconds
+    cb_url: str = "https://www.cbr-xml-daily.ru/daily_json.js"
+    cb_connect_timeout: float = 1
+    cb_read_timeout: float = 3
+    cb_retries: int = 2
+    cb_retry_backoff: float = 0.2
+    cb_keepalive_expiry: float = 60
+    cb_failure_threshold: int = 5
+    cb_reset_timeout: float = 60
+    # background refresh of exchange rates, seconds
+    rates_refresh_interval: int = 3600
+    rates_refresh_ahead: int = 300
+    # parcel type tariffs change check, seconds
+    tariffs_refresh_interval: int = 60
     secret_key: str = "your-secret-key"
     https_only: bool = False
 
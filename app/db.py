@@ -1,8 +1,10 @@
 import contextlib
 import logging
 from dataclasses import dataclass, field
-from typing import AsyncIterator
+from typing import AsyncIterator, Sequence
 
+from sqlalchemy import Insert, inspect
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
     AsyncEngine,
@@ -16,6 +18,30 @@ class DBError(Exception):
     pass
 
 
+def insert_or_ignore(
+    model: type[SQLModel],
+    dialect_name: str,
+    index_elements: Sequence[str],
+) -> Insert:
+    "INSERT that silently skips rows violating a unique key"
+    match dialect_name:
+        case "mysql":
+            # no-op update, INSERT IGNORE would also swallow data errors
+            primary_key = inspect(model).primary_key[0]
+            return mysql.insert(model).on_duplicate_key_update(
+                {primary_key.name: primary_key},
+            )
+        case "sqlite":
+            return sqlite.insert(model).on_conflict_do_nothing(
+                index_elements=index_elements,
+            )
+        case "postgresql":
+            return postgresql.insert(model).on_conflict_do_nothing(
+                index_elements=index_elements,
+            )
+    raise DBError(f"Insert or ignore isn't supported for {dialect_name}")
+
+
 @dataclass
 class DatabaseSessionManager:
     engine: AsyncEngine
@@ -0,0 +1,34 @@
+import math
+
+from fastapi import FastAPI, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+
+
+def encode_float(value: float) -> float | str:
+    # e.g. 1e309 is parsed as inf, which isn't valid json
+    return value if math.isfinite(value) else str(value)
+
+
+async def request_validation_handler(
+    request: Request,
+    exc: RequestValidationError,
+) -> JSONResponse:
+    "The default handler, but rejected non-finite inputs are echoed too"
+    return JSONResponse(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content={
+            "detail": jsonable_encoder(
+                exc.errors(),
+                custom_encoder={float: encode_float},
+            ),
+        },
+    )
+
+
+def apply_exception_handlers(app: FastAPI) -> None:
+    app.add_exception_handler(
+        RequestValidationError,
+        request_validation_handler,
+    )
@@ -1,6 +1,7 @@
 import logging
 from typing import AsyncIterable
 
+import httpx
 from dishka import (
     AsyncContainer,
     Provider,
@@ -15,13 +16,16 @@ from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 import app.di
+from app.cache import TTLCache
+from app.circuit_breaker import CircuitBreaker
 from app.config import Settings
 from app.db import DatabaseSessionManager
 from app.src.currency.service import ExchangeRateService
 from app.src.delivery.services.parcel_publisher import PublisherService
 from app.src.delivery.services.parcels_service import ParcelService
+from app.src.delivery.services.tariffs import TariffService
 from app.src.delivery.services.worker_service import BackgroundWorkerService
-from app.src.users.services import UserService
+from app.src.users.services import KnownUsersCache, UserService
 
 REDIS_HEALTH_CHECK_INTERVAL_S = 600
 
@@ -52,7 +56,14 @@ class AppProvider(Provider):
             settings.db_host,
             settings.mysql_database,
         )
-        return create_async_engine(database_url)
+        return create_async_engine(
+            database_url,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+        )
 
     @provide(scope=Scope.APP)
     async def session_manager(
@@ -70,10 +81,61 @@ class AppProvider(Provider):
         yield BackgroundWorkerService(settings=settings)
 
     @provide(scope=Scope.APP)
-    def exchange_service(self, redis: Redis) -> ExchangeRateService:
-        return ExchangeRateService(redis=redis)
+    async def get_http_client(
+        self,
+        settings: Settings,
+    ) -> AsyncIterable[httpx.AsyncClient]:
+        async with httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.cb_read_timeout,
+                connect=settings.cb_connect_timeout,
+            ),
+            limits=httpx.Limits(
+                keepalive_expiry=settings.cb_keepalive_expiry,
+            ),
+        ) as client:
+            yield client
+
+    @provide(scope=Scope.APP)
+    def exchange_service(
+        self,
+        redis: Redis,
+        http_client: httpx.AsyncClient,
+        settings: Settings,
+    ) -> ExchangeRateService:
+        return ExchangeRateService(
+            redis=redis,
+            http_client=http_client,
+            cb_url=settings.cb_url,
+            retries=settings.cb_retries,
+            retry_backoff=settings.cb_retry_backoff,
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=settings.cb_failure_threshold,
+                reset_timeout=settings.cb_reset_timeout,
+            ),
+            local_cache=TTLCache(
+                maxsize=settings.rates_local_cache_size,
+                ttl=settings.rates_local_cache_ttl,
+            ),
+        )
+
+    @provide(scope=Scope.APP)
+    async def tariff_service(
+        self,
+        session_manager: DatabaseSessionManager,
+    ) -> TariffService:
+        tariff_service = TariffService(session_manager=session_manager)
+        await tariff_service.load()
+        return tariff_service
 
     @provide(scope=Scope.APP)
+    def known_users(self, settings: Settings) -> KnownUsersCache:
+        return KnownUsersCache(
+            maxsize=settings.users_cache_size,
+            ttl=settings.users_cache_ttl,
+        )
+
+    @provide(scope=Scope.REQUEST)
     async def db_session(
         self,
         session_manager: DatabaseSessionManager,
@@ -81,26 +143,33 @@ class AppProvider(Provider):
         async with session_manager.session() as session:
             yield session
 
-    @provide(scope=Scope.APP)
+    @provide(scope=Scope.REQUEST)
     async def user_service(
         self,
         db_session: AsyncSession,
         settings: Settings,
+        known_users: KnownUsersCache,
     ) -> AsyncIterable[UserService]:
-        yield UserService(db_session=db_session, settings=settings)
+        yield UserService(
+            db_session=db_session,
+            settings=settings,
+            known_users=known_users,
+        )
 
-    @provide(scope=Scope.APP)
+    @provide(scope=Scope.REQUEST)
     async def parcel_service(
         self,
         db_session: AsyncSession,
         exchange_service: ExchangeRateService,
+        tariff_service: TariffService,
     ) -> AsyncIterable[ParcelService]:
         yield ParcelService(
             db_session=db_session,
             exchange_service=exchange_service,
+            tariff_service=tariff_service,
         )
 
-    @provide(scope=Scope.REQUEST)
+    @provide(scope=Scope.APP)
     async def publisher_service(
         self,
         settings: Settings,
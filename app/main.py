@@ -9,11 +9,14 @@ from fastapi import FastAPI
 from app.config import Settings, get_settings
 from app.db import DatabaseSessionManager
 from app.di import get_container
+from app.exception_handlers import apply_exception_handlers
 from app.ioc import setup_container
 from app.middleware import apply_middlewares
 from app.routes import apply_routes, tags_metadata
 from app.src.currency.service import ExchangeRateService
 from app.src.delivery.models import init_parcel_types
+from app.src.delivery.services.parcel_publisher import PublisherService
+from app.src.delivery.services.tariffs import TariffService
 from app.src.delivery.services.worker_service import BackgroundWorkerService
 
 settings = get_settings()
@@ -30,11 +33,8 @@ async def init_db(container):
 
 
 async def startup_events(settings: Settings, container):
-    # Update usd rate in start
     container = get_container()
-    # update usd on start
-    exchange_service = await container.get(ExchangeRateService)
-    await exchange_service.fetch_currency(currency="USD")
+    # rates are warmed by the background refresher, boot doesn't wait for CB
 
     if settings.init_db:
         # db init logic
@@ -47,14 +47,39 @@ async def lifespan(app: FastAPI):
     logger.info("App %s is starting", settings.title)
 
     await startup_events(settings, container)
+    exchange_service = await container.get(ExchangeRateService)
+    rates_listener = asyncio.create_task(
+        exchange_service.listen_invalidations(),
+    )
+    rates_refresher = asyncio.create_task(
+        exchange_service.run_refresher(
+            interval=settings.rates_refresh_interval,
+            ahead=settings.rates_refresh_ahead,
+        ),
+    )
+    tariff_service = await container.get(TariffService)
+    tariffs_refresher = asyncio.create_task(
+        tariff_service.run_refresher(
+            interval=settings.tariffs_refresh_interval,
+        ),
+    )
+    background_worker_service = None
     if not settings.testing_mode:
         # do not connect in testing
+        publisher_service = await container.get(PublisherService)
+        await publisher_service.connect()
+    if settings.in_app_worker and not settings.testing_mode:
+        # off when queues are consumed by app.worker processes
         background_worker_service = await container.get(BackgroundWorkerService)
         asyncio.create_task(background_worker_service.run())
 
     yield
     # graceful shutdown
-    await background_worker_service.close()
+    rates_listener.cancel()
+    rates_refresher.cancel()
+    tariffs_refresher.cancel()
+    if background_worker_service:
+        await background_worker_service.close()
     await app.state.dishka_container.close()
     logger.info("App %s closed", settings.title)
 
@@ -69,6 +94,7 @@ def create_app(settings: Settings) -> FastAPI:
     )
     apply_routes(app=app)
     apply_middlewares(app=app, settings=settings)
+    apply_exception_handlers(app=app)
     return app
 
 
@@ -0,0 +1,16 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    """Serializes pydantic models in a single pass with pydantic-core.
+
+    Endpoints return this response directly, so FastAPI skips response_model
+    validation and jsonable_encoder; content must be valid already.
+    Decimal is rendered as a string, UUID and datetime as ISO strings.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
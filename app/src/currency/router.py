@@ -1,13 +1,37 @@
 from typing import Annotated
 
 from dishka.integrations.fastapi import FromDishka, inject
-from fastapi import APIRouter, Path
+from fastapi import APIRouter, Path, Query
 
-from app.src.currency.service import CurrencyResponse, ExchangeRateService
+from app.src.currency.service import (
+    CurrenciesResponse,
+    CurrencyResponse,
+    ExchangeRateService,
+)
 
 currency_router = APIRouter()
 
 
+@currency_router.get(
+    "",
+    tags=["api"],
+    response_model=CurrenciesResponse,
+)
+@inject
+async def get_currencies(
+    codes: Annotated[
+        str,
+        Query(title="Comma separated currencies", examples=["USD,EUR,CNY"]),
+    ],
+    service: FromDishka[ExchangeRateService],
+) -> CurrenciesResponse:
+    "Returns currencies values and CB date."
+
+    return await service.fetch_currencies(
+        currencies=[code.strip() for code in codes.split(",") if code.strip()],
+    )
+
+
 @currency_router.get(
     "/{currency}",
     tags=["api"],
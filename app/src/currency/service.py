@@ -1,14 +1,20 @@
 import asyncio
 import logging
-from dataclasses import dataclass
+import random
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from decimal import Decimal
 from http import HTTPStatus
+from uuid import uuid4
 
 import httpx
 from fastapi import HTTPException
 from pydantic import BaseModel, ValidationError
 from redis import Redis
+from redis.exceptions import RedisError, WatchError
+
+from app.cache import TTLCache
+from app.circuit_breaker import CircuitBreaker
 
 logger = logging.getLogger(__name__)
 
@@ -39,15 +45,63 @@ class CurrencyResponse(BaseModel):
     value: Decimal
 
 
-CURRENCY_PREFIX = "CB_VALUE_"
-LOCK_PREFIX = "LOCKED_CB_"
-BLOCKING_TIMEOUT = 3
+class CurrenciesResponse(BaseModel):
+    date: datetime
+    currencies: list[CurrencyResponse]
+
+
+# whole CBR table, CharCode -> Value plus the table date
+CURRENCY_RATES_KEY = "CB_RATES"
+CB_DATE_FIELD = "Date"
+# never expiring copy of the last table, served while the bank is down
+LAST_GOOD_RATES_KEY = "CB_RATES_LAST_GOOD"
+# only one instance of the fleet asks the bank
+REFRESH_LEASE_KEY = "LOCKED_CB_RATES"
+# lease and waiters outlive the slowest refresh by this, seconds
+REFRESH_LEASE_MARGIN = 1
+# httpx default, for client timeouts that aren't set
+CB_DEFAULT_TIMEOUT = 5
+LEASE_POLL_INTERVAL = 0.05
+# new table notifications for local caches of all instances
+RATES_CHANNEL = "CB_RATES_UPDATED"
+RATES_LISTENER_RECONNECT_DELAY = 1
+REDIS_NO_KEY_TTL = -2
+REDIS_NO_EXPIRE_TTL = -1
+# pause after every background refresh attempt
+REFRESH_MIN_DELAY = 30
+CB_URL = "https://www.cbr-xml-daily.ru/daily_json.js"
+CB_RETRIES = 2
+CB_RETRY_BACKOFF = 0.2
+CB_FAILURE_THRESHOLD = 5
+CB_RESET_TIMEOUT = 60
+LOCAL_CACHE_SIZE = 256
+LOCAL_CACHE_TTL = 300
 
 
 @dataclass
 class ExchangeRateService:
     redis: Redis
-    cb_url = "https://www.cbr-xml-daily.ru/daily_json.js"
+    # app scoped client, keeps connections to the bank alive
+    http_client: httpx.AsyncClient
+    local_cache: TTLCache[str, str] = field(
+        default_factory=lambda: TTLCache(
+            maxsize=LOCAL_CACHE_SIZE,
+            ttl=LOCAL_CACHE_TTL,
+        ),
+    )
+    cb_url: str = CB_URL
+    retries: int = CB_RETRIES
+    retry_backoff: float = CB_RETRY_BACKOFF
+    circuit_breaker: CircuitBreaker = field(
+        default_factory=lambda: CircuitBreaker(
+            failure_threshold=CB_FAILURE_THRESHOLD,
+            reset_timeout=CB_RESET_TIMEOUT,
+        ),
+    )
+    # in-flight refresh shared by concurrent cache misses
+    _refresh: asyncio.Future | None = field(default=None, init=False)
+    # logged once per outage, not per request
+    _stale: bool = field(default=False, init=False)
 
     async def fetch_currency(self, currency: str = "USD") -> CurrencyResponse:
         """Got currency"""
@@ -57,48 +111,193 @@ class ExchangeRateService:
             value=Decimal(await self.get_currency(currency=currency)),
         )
 
+    async def fetch_currencies(
+        self,
+        currencies: list[str],
+    ) -> CurrenciesResponse:
+        "Got currencies with one cache lookup"
+        currencies = list(
+            dict.fromkeys(currency.upper() for currency in currencies),
+        )
+        values, cb_date = await self.get_currencies(currencies)
+        if missing := [
+            currency
+            for currency, value in zip(currencies, values, strict=True)
+            if value is None
+        ]:
+            raise self.not_found_error(", ".join(missing))
+        return CurrenciesResponse(
+            date=cb_date,
+            currencies=[
+                CurrencyResponse(currency_name=currency, value=Decimal(value))
+                for currency, value in zip(currencies, values, strict=True)
+            ],
+        )
+
+    async def get_currencies(
+        self,
+        currencies: list[str],
+    ) -> tuple[list[str | None], str]:
+        "Returns values in the same order and the table date"
+        values, cb_date = await self._load_rates(CURRENCY_RATES_KEY, currencies)
+        if cb_date:
+            return values, cb_date
+        values, cb_date = await self._load_rates(
+            LAST_GOOD_RATES_KEY,
+            currencies,
+        )
+        if cb_date:
+            # stale while revalidate
+            self._start_refresh()
+            return values, cb_date
+        await self.refresh_rates()
+        return await self._load_rates(CURRENCY_RATES_KEY, currencies)
+
+    async def _load_rates(
+        self,
+        key: str,
+        currencies: list[str],
+    ) -> tuple[list[str | None], str | None]:
+        *values, cb_date = await self.redis.hmget(
+            key,
+            [*currencies, CB_DATE_FIELD],
+        )
+        return values, cb_date
+
     async def get_currency(self, currency: str) -> str:
         if value := await self._load_cached_currency(
             currency=currency,
         ):
             return value
-        # in prod better way is using redis lock but it conflicts with fakeredis
-        async with asyncio.Lock():
-            return await self._load_cached_currency(
-                currency=currency,
-            ) or await self.request_currency_from_cb(currency=currency)
+        if value := await self._load_last_good_currency(currency=currency):
+            # stale while revalidate
+            self._start_refresh()
+            return value
+        await self.refresh_rates()
+        if value := await self._load_cached_currency(
+            currency=currency,
+        ):
+            return value
+        raise self.not_found_error(currency)
+
+    async def refresh_rates(self) -> None:
+        "Coalesces concurrent refreshes of the process into one"
+        # a cancelled waiter must not cancel the refresh for the others
+        await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self) -> asyncio.Future:
+        if self._refresh is None:
+            self._refresh = asyncio.ensure_future(self._refresh_rates())
+            self._refresh.add_done_callback(self._reset_refresh)
+        return self._refresh
+
+    def _reset_refresh(self, refresh: asyncio.Future) -> None:
+        self._refresh = None
+        if refresh.cancelled():
+            return
+        # background refreshes have no waiter to get the error
+        if ex := refresh.exception():
+            self._set_stale(f"rates refresh failed: {ex}")
+            return
+        if self._stale:
+            self._stale = False
+            logger.info("Rates refreshed, stale rates are no longer served")
+
+    def _set_stale(self, reason: str) -> None:
+        if self._stale:
+            logger.debug("Still stale, %s", reason)
+            return
+        self._stale = True
+        logger.warning("Serving last good rates, %s", reason)
+
+    async def _refresh_rates(self) -> None:
+        token = uuid4().hex
+        lease_timeout = self.get_refresh_timeout() + REFRESH_LEASE_MARGIN
+        if await self.redis.set(
+            REFRESH_LEASE_KEY,
+            token,
+            nx=True,
+            px=int(lease_timeout * 1000),
+        ):
+            try:
+                await self.save_to_cache(await self.get_from_cb())
+            finally:
+                await self._release_lease(token)
+            return
+        if await self._wait_for_rates(lease_timeout):
+            return
+        logger.warning("Rates refresh lease timed out, fetching directly")
+        await self.save_to_cache(await self.get_from_cb())
+
+    def get_refresh_timeout(self) -> float:
+        "The longest a refresh can take with all the retries, seconds"
+        timeout = self.http_client.timeout
+        attempt_timeout = (timeout.connect or CB_DEFAULT_TIMEOUT) + (
+            timeout.read or CB_DEFAULT_TIMEOUT
+        )
+        max_backoff = sum(
+            self.retry_backoff * 2**attempt for attempt in range(self.retries)
+        )
+        return attempt_timeout * (self.retries + 1) + max_backoff
+
+    async def _wait_for_rates(self, timeout: float) -> bool:
+        "Waits for another instance holding the lease to save the table"
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if await self.redis.exists(CURRENCY_RATES_KEY):
+                return True
+            await asyncio.sleep(LEASE_POLL_INTERVAL)
+        return False
+
+    async def _release_lease(self, token: str) -> None:
+        # compare and delete, an expired lease may belong to another instance
+        async with self.redis.pipeline() as pipe:
+            try:
+                await pipe.watch(REFRESH_LEASE_KEY)
+                if await pipe.get(REFRESH_LEASE_KEY) != token:
+                    return
+                pipe.multi()
+                pipe.delete(REFRESH_LEASE_KEY)
+                await pipe.execute()
+            except WatchError:
+                # taken over right before the delete, it isn't ours
+                return
 
     async def _load_cached_currency(self, currency: str) -> str | None:
-        value = await self.redis.get(f"{CURRENCY_PREFIX}{currency}")
+        if value := self.local_cache.get(currency):
+            return value
+        value, cb_date = await self.redis.hmget(
+            CURRENCY_RATES_KEY,
+            [currency, CB_DATE_FIELD],
+        )
         if value:
             logger.debug("%s got value:%s from cache", currency, value)
+            self.local_cache.set(currency, value)
+        elif cb_date:
+            # the table is fresh, asking the bank again won't help
+            raise self.not_found_error(currency)
 
         return value
 
-    async def request_currency_from_cb(self, currency: str) -> Decimal:
-        try:
-            cb_response: CBResponse = await self.get_from_cb()
-        except ValidationError as ex:
-            raise ExchangeRateError(
-                status_code=HTTPStatus.BAD_REQUEST,
-                detail=ex,
-            ) from ex
-        if currency not in cb_response.Valute:
-            raise ExchangeRateError(
-                status_code=HTTPStatus.BAD_REQUEST,
-                detail=f"{currency} not found in answer",
-            )
-        await self.save_to_cache(
-            currency=cb_response.Valute[currency],
-            cb_date=cb_response.Date,
+    async def _load_last_good_currency(self, currency: str) -> str | None:
+        value, cb_date = await self.redis.hmget(
+            LAST_GOOD_RATES_KEY,
+            [currency, CB_DATE_FIELD],
         )
-        return str(cb_response.Valute[currency].Value)
+        if value:
+            self._set_stale(f"the table of {cb_date} expired")
+        return value
 
-    async def save_to_cache(
-        self,
-        currency: CBCurrency,
-        cb_date: datetime,
-    ) -> None:
+    @staticmethod
+    def not_found_error(currency: str) -> ExchangeRateError:
+        return ExchangeRateError(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=f"{currency} not found in answer",
+        )
+
+    async def save_to_cache(self, cb_response: CBResponse) -> None:
+        cb_date = cb_response.Date
         # get cache seconds till the next day
         next_day_start = (cb_date + timedelta(days=1)).replace(
             hour=0,
@@ -109,23 +308,125 @@ class ExchangeRateService:
 
         seconds_to_next_day = int((next_day_start - cb_date).total_seconds())
 
-        await self.redis.set(
-            f"{CURRENCY_PREFIX}{currency.CharCode}",
-            value=str(currency.Value),
-            ex=seconds_to_next_day,
-        )
+        rates = {
+            currency.CharCode: str(currency.Value)
+            for currency in cb_response.Valute.values()
+        }
+        # one round trip, the table is replaced atomically
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(CURRENCY_RATES_KEY)
+            pipe.hset(
+                CURRENCY_RATES_KEY,
+                mapping=rates | {CB_DATE_FIELD: cb_date.isoformat()},
+            )
+            pipe.expire(CURRENCY_RATES_KEY, seconds_to_next_day)
+            pipe.delete(LAST_GOOD_RATES_KEY)
+            pipe.hset(
+                LAST_GOOD_RATES_KEY,
+                mapping=rates | {CB_DATE_FIELD: cb_date.isoformat()},
+            )
+            pipe.publish(RATES_CHANNEL, cb_date.isoformat())
+            await pipe.execute()
+        self.local_cache.clear()
+
+    async def run_refresher(self, interval: float, ahead: float) -> None:
+        "Refreshes the table before it expires so requests never wait"
+        while True:
+            try:
+                await asyncio.sleep(
+                    await self.get_refresh_delay(interval, ahead),
+                )
+                await self.refresh_rates()
+            except Exception as ex:
+                # nothing may end the refresher, e.g. a malformed bank reply
+                logger.error("Background rates refresh failed: %r", ex)
+            await asyncio.sleep(REFRESH_MIN_DELAY)
+
+    async def get_refresh_delay(self, interval: float, ahead: float) -> float:
+        ttl = await self.redis.ttl(CURRENCY_RATES_KEY)
+        if ttl == REDIS_NO_KEY_TTL:
+            return 0
+        if ttl == REDIS_NO_EXPIRE_TTL:
+            return interval
+        return max(min(interval, ttl - ahead), 0)
+
+    async def listen_invalidations(self) -> None:
+        "Drops local rates whenever any instance saves a new table"
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(RATES_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            logger.debug("Rates updated: %s", message["data"])
+                            self.local_cache.clear()
+            except RedisError as ex:
+                # updates could be missed while disconnected
+                logger.error("Rates listener disconnected: %s", ex)
+                self.local_cache.clear()
+                await asyncio.sleep(RATES_LISTENER_RECONNECT_DELAY)
 
     async def fetch_cb(self):
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(self.cb_url, timeout=3)
-                response.raise_for_status()
-        except httpx.HTTPStatusError as ex:
+        if not self.circuit_breaker.allow_request():
             raise ExchangeRateError(
-                status_code=HTTPStatus.BAD_REQUEST,
-                detail=ex,
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail="CB requests are paused after failures",
+            )
+        try:
+            cb_response = await self._fetch_cb_with_retries()
+        except ExchangeRateError:
+            self.circuit_breaker.record_failure()
+            raise
+        self.circuit_breaker.record_success()
+        return cb_response
+
+    async def _fetch_cb_with_retries(self):
+        for attempt in range(self.retries):
+            try:
+                return await self._request_cb()
+            except httpx.RequestError as ex:
+                # network errors and malformed bodies
+                logger.warning("CB request failed: %r", ex)
+            except httpx.HTTPStatusError as ex:
+                if not self.is_retryable(ex.response):
+                    raise self.cb_error(ex) from ex
+                logger.warning("CB responded with %s", ex.response.status_code)
+            await asyncio.sleep(self.get_retry_delay(attempt))
+        # the last attempt raises whatever happens
+        try:
+            return await self._request_cb()
+        except httpx.HTTPError as ex:
+            raise self.cb_error(ex) from ex
+
+    async def _request_cb(self):
+        response = await self.http_client.get(self.cb_url)
+        response.raise_for_status()
+        try:
+            return response.json()
+        except ValueError as ex:
+            # e.g. a maintenance html page with 200
+            raise httpx.DecodingError(
+                f"Malformed CB response: {ex}",
+                request=response.request,
             ) from ex
-        return response.json()
+
+    def get_retry_delay(self, attempt: int) -> float:
+        # full jitter spreads retries of the fleet
+        return random.uniform(0, self.retry_backoff * 2**attempt)
+
+    @staticmethod
+    def is_retryable(response: httpx.Response) -> bool:
+        return (
+            response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+            or response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+        )
+
+    @staticmethod
+    def cb_error(ex: httpx.HTTPError) -> ExchangeRateError:
+        return ExchangeRateError(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=str(ex),
+        )
 
     async def get_from_cb(self):
         try:
@@ -1,8 +1,12 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
 from decimal import Decimal
 from enum import Enum
+from typing import Annotated
 from uuid import UUID, uuid4
 
 from pydantic import BaseModel, Field
+from sqlalchemy import Row
 
 from app.src.delivery.models import Parcel
 
@@ -11,20 +15,48 @@ class BackgroundCreationResponse(str, Enum):
     IN_PROGRESS = "in progress"
 
 
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
 class GetParcelsFilterParams(BaseModel):
     offset: int = 0
     limit: int = 100
+    # opaque token from X-Next-Cursor header, offset is ignored with it
+    cursor: str | None = None
     page_type: UUID | None = None
     with_delivery_price: bool | None = None
 
 
-class RegisterParcelDTO(BaseModel):
-    # idempotency key, remove default value in prod
-    request_id: UUID = Field(default_factory=uuid4)
+class ParcelsCursor(BaseModel):
+    "Keyset position of the last returned parcel."
+
+    created_at: datetime
+    id: UUID
+
+    def encode(self) -> str:
+        return urlsafe_b64encode(self.model_dump_json().encode()).decode()
+
+    @classmethod
+    def decode(cls, token: str) -> "ParcelsCursor":
+        return cls.model_validate_json(urlsafe_b64decode(token.encode()))
+
 
-    weight: float = Field(1, ge=0)
+class ParcelQuoteDTO(BaseModel):
+    weight: float = Field(1, ge=0, allow_inf_nan=False)
     dollar_price: Decimal = Field(Decimal(1), ge=0)
     parcel_type_id: UUID
+
+
+class ParcelQuoteResponse(ParcelQuoteDTO):
+    delivery_price: Decimal
+
+
+class RegisterParcelDTO(ParcelQuoteDTO):
+    # idempotency key, remove default value in prod
+    request_id: UUID = Field(default_factory=uuid4)
+
     name: str = ""
 
 
@@ -32,25 +64,76 @@ class RegisterParcelWithUserDTO(RegisterParcelDTO):
     user_id: UUID
 
 
+MAX_PARCELS_BATCH_SIZE = 1000
+
+RegisterParcelsBatchDTO = Annotated[
+    list[RegisterParcelDTO],
+    Field(min_length=1, max_length=MAX_PARCELS_BATCH_SIZE),
+]
+
+
+ParcelsQuoteDTO = Annotated[
+    list[ParcelQuoteDTO],
+    Field(min_length=1, max_length=MAX_PARCELS_BATCH_SIZE),
+]
+
+
+class BatchItemStatus(str, Enum):
+    CREATED = "created"
+    EXISTING = "existing"
+
+
+class RegisterParcelsBatchItemResponse(BaseModel):
+    request_id: UUID
+    parcel_id: UUID
+    status: BatchItemStatus
+
+
 class GetParcelResponseDTO(BaseModel):
     id: UUID
     name: str
     weight: float
     dollar_price: str
     delivery_price: str
-    parcel_type_name: str
+    # parcel_type_id is nullable, the type is outer joined
+    parcel_type_name: str | None
     user_id: UUID | None
 
 
+def format_dollar_price(dollar_price: Decimal) -> str:
+    return f"{dollar_price} $"
+
+
+def format_delivery_price(delivery_price: Decimal | None) -> str:
+    return (
+        f"{delivery_price} руб."
+        if delivery_price is not None
+        else "Не рассчитано"
+    )
+
+
 def convert_parcel_to_response_dto(parcel: Parcel) -> GetParcelResponseDTO:
     return GetParcelResponseDTO(
         id=parcel.id,
         name=parcel.name,
         weight=parcel.weight,
-        dollar_price=f"{parcel.dollar_price} $",
-        delivery_price=f"{parcel.delivery_price} руб."
-        if parcel.delivery_price is not None
-        else "Не рассчитано",
-        parcel_type_name=parcel.parcel_type.name,
+        dollar_price=format_dollar_price(parcel.dollar_price),
+        delivery_price=format_delivery_price(parcel.delivery_price),
+        parcel_type_name=parcel.parcel_type.name
+        if parcel.parcel_type
+        else None,
         user_id=parcel.user_id,
     )
+
+
+def convert_row_to_response_dto(row: Row) -> GetParcelResponseDTO:
+    "Maps a projected parcels row, values are typed by the db driver already"
+    return GetParcelResponseDTO.model_construct(
+        id=row.id,
+        name=row.name,
+        weight=row.weight,
+        dollar_price=format_dollar_price(row.dollar_price),
+        delivery_price=format_delivery_price(row.delivery_price),
+        parcel_type_name=row.parcel_type_name,
+        user_id=row.user_id,
+    )
@@ -2,11 +2,15 @@ from datetime import datetime, timezone
 from decimal import Decimal
 from uuid import UUID, uuid4
 
-from sqlmodel import Field, Relationship, SQLModel
+from sqlmodel import Field, Index, Relationship, SQLModel
 
 from app.db import DatabaseSessionManager
 from app.src.users.models import User
 
+# default tariff: 1% of the declared price plus $0.5 per kilogram
+DEFAULT_PRICE_RATE = Decimal("0.01")
+DEFAULT_WEIGHT_RATE = Decimal("0.5")
+
 
 class ParcelType(SQLModel, table=True):
     __tablename__ = "parcel_types"
@@ -16,6 +20,19 @@ class ParcelType(SQLModel, table=True):
     )
     name: str = Field(unique=True)
     description: str = ""
+    # delivery tariff coefficients, see TariffService
+    price_rate: Decimal = Field(
+        default=DEFAULT_PRICE_RATE,
+        max_digits=10,
+        decimal_places=4,
+        ge=0,
+    )
+    weight_rate: Decimal = Field(
+        default=DEFAULT_WEIGHT_RATE,
+        max_digits=10,
+        decimal_places=4,
+        ge=0,
+    )
     created_at: datetime | None = Field(
         default_factory=lambda: datetime.now(timezone.utc),
     )
@@ -31,6 +48,22 @@ class ParcelType(SQLModel, table=True):
 
 class Parcel(SQLModel, table=True):
     __tablename__ = "parcels"
+    __table_args__ = (
+        # keyset pagination of user parcels
+        Index(
+            "ix_parcels_user_id_created_at_id",
+            "user_id",
+            "created_at",
+            "id",
+        ),
+        # parcels filtered by type, ordered for pagination
+        Index(
+            "ix_parcels_user_id_parcel_type_id_created_at",
+            "user_id",
+            "parcel_type_id",
+            "created_at",
+        ),
+    )
 
     id: UUID | None = Field(
         primary_key=True,
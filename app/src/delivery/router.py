@@ -3,61 +3,105 @@ from uuid import UUID
 
 from dishka.integrations.fastapi import DishkaRoute, FromDishka
 from fastapi import APIRouter, Path, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Row
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.responses import FastJSONResponse
 from app.src.delivery.entities import (
     BackgroundCreationResponse,
+    ExportFormat,
     GetParcelResponseDTO,
     GetParcelsFilterParams,
+    ParcelQuoteResponse,
+    ParcelsQuoteDTO,
     RegisterParcelDTO,
+    RegisterParcelsBatchDTO,
+    RegisterParcelsBatchItemResponse,
     RegisterParcelWithUserDTO,
     convert_parcel_to_response_dto,
+    convert_row_to_response_dto,
 )
 from app.src.delivery.models import Parcel, ParcelType
 from app.src.delivery.services.parcel_publisher import PublisherService
+from app.src.delivery.services.parcels_export import EXPORTERS, MEDIA_TYPES
 from app.src.delivery.services.parcels_service import ParcelService
-from app.src.users.models import User
 from app.src.users.services import UserService
 
 delivery_router = APIRouter(route_class=DishkaRoute)
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 
 @delivery_router.get(
     "/parcels",
     tags=["api"],
     response_model=Iterable[GetParcelResponseDTO],
+    response_class=FastJSONResponse,
 )
 async def get_parcels(
     request: Request,
     filter_query: Annotated[GetParcelsFilterParams, Query()],
     user_service: FromDishka[UserService],
     parcel_service: FromDishka[ParcelService],
-) -> Iterable[GetParcelResponseDTO]:
+) -> FastJSONResponse:
     "Returns user parcels"
-    user: User = await user_service.get_user(session=request.session)
-    parcels: Iterable[Parcel] = await parcel_service.get_parcels(
-        user=user,
+    user_id: UUID = user_service.get_session_user_id(session=request.session)
+    parcels: Sequence[Row] = await parcel_service.get_parcels(
+        user_id=user_id,
         filter_query=filter_query,
     )
+    headers = {}
+    if next_cursor := parcel_service.get_next_cursor(parcels, filter_query):
+        headers[NEXT_CURSOR_HEADER] = next_cursor
 
-    return (convert_parcel_to_response_dto(parcel) for parcel in parcels)
+    return FastJSONResponse(
+        [convert_row_to_response_dto(parcel) for parcel in parcels],
+        headers=headers,
+    )
 
 
 @delivery_router.get(
     "/parcels/types",
     tags=["api"],
     response_model=Sequence[ParcelType],
+    response_class=FastJSONResponse,
 )
 async def get_parcels_types(
     db_session: FromDishka[AsyncSession],
-) -> Sequence[ParcelType]:
+) -> FastJSONResponse:
     "Returns all parcels type"
     async with db_session as session:
         results = await session.exec(
             select(ParcelType).order_by(ParcelType.name),
         )
-    return results.all()
+    return FastJSONResponse(results.all())
+
+
+@delivery_router.get(
+    "/parcels/export",
+    tags=["api"],
+    response_class=StreamingResponse,
+)
+async def export_parcels(
+    request: Request,
+    export_format: Annotated[ExportFormat, Query(alias="format")],
+    user_service: FromDishka[UserService],
+    parcel_service: FromDishka[ParcelService],
+) -> StreamingResponse:
+    "Streams all user parcels"
+    user_id: UUID = user_service.get_session_user_id(session=request.session)
+    exporter = EXPORTERS[export_format]
+    return StreamingResponse(
+        exporter(parcel_service.stream_parcels(user_id=user_id)),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename=parcels.{export_format.value}"
+            ),
+        },
+    )
 
 
 @delivery_router.post(
@@ -73,14 +117,47 @@ async def register_parcel(
     parcel_service: FromDishka[ParcelService],
 ) -> Parcel:
     "Returns parcel."
-    user: User = await user_service.get_user(session=request.session)
+    user_id: UUID = await user_service.get_user_id(session=request.session)
     parcel: Parcel = await parcel_service.create_parcel(
-        user=user,
+        user_id=user_id,
         parcel_dto=parcel_dto,
     )
     return parcel
 
 
+@delivery_router.post(
+    "/parcels/batch",
+    tags=["api"],
+    status_code=status.HTTP_201_CREATED,
+    response_model=list[RegisterParcelsBatchItemResponse],
+)
+async def register_parcels_batch(
+    request: Request,
+    parcel_dtos: RegisterParcelsBatchDTO,
+    user_service: FromDishka[UserService],
+    parcel_service: FromDishka[ParcelService],
+) -> list[RegisterParcelsBatchItemResponse]:
+    "Returns result for every parcel of the batch"
+    user_id: UUID = await user_service.get_user_id(session=request.session)
+    return await parcel_service.create_parcels(
+        user_id=user_id,
+        parcel_dtos=parcel_dtos,
+    )
+
+
+@delivery_router.post(
+    "/parcels/quote",
+    tags=["api"],
+    response_model=list[ParcelQuoteResponse],
+)
+async def quote_parcels(
+    quote_dtos: ParcelsQuoteDTO,
+    parcel_service: FromDishka[ParcelService],
+) -> list[ParcelQuoteResponse]:
+    "Returns delivery prices, nothing is saved"
+    return await parcel_service.quote_parcels(quote_dtos=quote_dtos)
+
+
 @delivery_router.post(
     "/parcels/background",
     tags=["api"],
@@ -94,9 +171,9 @@ async def register_parcel_with_mb(
     publisher_service: FromDishka[PublisherService],
 ) -> BackgroundCreationResponse:
     "Returns simple object"
-    user: User = await user_service.get_user(session=request.session)
+    user_id: UUID = await user_service.get_user_id(session=request.session)
     message: RegisterParcelWithUserDTO = RegisterParcelWithUserDTO(
-        user_id=user.id,
+        user_id=user_id,
         **parcel_dto.model_dump(),
     )
     await publisher_service.publish_message(message.model_dump_json())
@@ -107,18 +184,19 @@ async def register_parcel_with_mb(
     "/parcels/{parcel_id}",
     tags=["api"],
     response_model=GetParcelResponseDTO,
+    response_class=FastJSONResponse,
 )
 async def get_parcel(
     request: Request,
     parcel_id: Annotated[UUID, Path(title="Parcel id")],
     user_service: FromDishka[UserService],
     parcel_service: FromDishka[ParcelService],
-) -> GetParcelResponseDTO:
+) -> FastJSONResponse:
     "Returns simple object"
-    user: User = await user_service.get_user(session=request.session)
+    user_id: UUID = user_service.get_session_user_id(session=request.session)
     parcel: Parcel | None = await parcel_service.get_parcel(
-        user=user,
+        user_id=user_id,
         parcel_id=parcel_id,
     )
 
-    return convert_parcel_to_response_dto(parcel)
+    return FastJSONResponse(convert_parcel_to_response_dto(parcel))
@@ -1,44 +1,163 @@
-from dataclasses import dataclass
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from functools import partial
 
 import aio_pika
+from aio_pika.abc import AbstractChannel, AbstractRobustConnection
+from aio_pika.exceptions import AMQPError
+from aio_pika.pool import Pool
+from fastapi import HTTPException, status
+from pamqp.commands import Basic
 
 from app.config import Settings
 
+logger = logging.getLogger(__name__)
+
+
+class PublisherError(HTTPException):
+    pass
+
 
 @dataclass
 class PublisherService:
+    "Long-lived publisher, one robust connection and a pool of channels"
+
     settings: Settings
 
-    @property
-    async def connection(self):
-        self._connection = getattr(
-            self,
-            "_connection",
-            None,
-        ) or await aio_pika.connect_robust(
-            host=self.settings.rabbitmq_host,
-            port=self.settings.rabbitmq_port,
-            login=self.settings.rabbitmq_user,
-            password=self.settings.rabbitmq_password,
+    _connection: AbstractRobustConnection | None = field(
+        init=False,
+        default=None,
+    )
+    _channel_pool: Pool[AbstractChannel] | None = field(
+        init=False,
+        default=None,
+    )
+    _confirm_channel: AbstractChannel | None = field(
+        init=False,
+        default=None,
+    )
+    _connect_lock: asyncio.Lock = field(
+        init=False,
+        default_factory=asyncio.Lock,
+    )
+    _in_flight: asyncio.Semaphore = field(init=False)
+
+    def __post_init__(self):
+        # unconfirmed messages, publishers wait when the broker lags
+        self._in_flight = asyncio.Semaphore(
+            self.settings.rabbitmq_max_in_flight,
         )
-        return self._connection
 
-    async def publish_message(self, message: str):
-        connection = await self.connection
-        async with connection:
-            channel = await connection.channel()
-            queue = await channel.declare_queue(
+    async def connect(self) -> None:
+        async with self._connect_lock:
+            if self._connection:
+                return
+            # robust connection reconnects and restores its channels
+            connection = await aio_pika.connect_robust(
+                host=self.settings.rabbitmq_host,
+                port=self.settings.rabbitmq_port,
+                login=self.settings.rabbitmq_user,
+                password=self.settings.rabbitmq_password,
+            )
+            try:
+                channel_pool, confirm_channel = await self.open_channels(
+                    connection,
+                )
+            except Exception:
+                # the next connect starts over
+                await connection.close()
+                raise
+            # set together, publishers check the connection only
+            self._channel_pool = channel_pool
+            self._confirm_channel = confirm_channel
+            self._connection = connection
+            logger.info("Publisher connected")
+
+    async def open_channels(
+        self,
+        connection: AbstractRobustConnection,
+    ) -> tuple[Pool[AbstractChannel], AbstractChannel | None]:
+        channel_pool = Pool(
+            partial(self.get_channel, connection),
+            max_size=self.settings.rabbitmq_publisher_channels,
+        )
+        confirm_channel = None
+        if self.settings.rabbitmq_publisher_confirms:
+            # one channel pipelines all confirmed publishes
+            confirm_channel = await connection.channel(
+                publisher_confirms=True,
+            )
+        async with channel_pool.acquire() as channel:
+            await channel.declare_queue(
                 self.settings.queue_name,
                 durable=True,
             )
-            await channel.default_exchange.publish(
-                aio_pika.Message(body=message.encode()),
-                routing_key=queue.name,
-            )
+        return channel_pool, confirm_channel
+
+    @staticmethod
+    async def get_channel(
+        connection: AbstractRobustConnection,
+    ) -> AbstractChannel:
+        return await connection.channel(publisher_confirms=False)
+
+    async def publish_message(self, message: str) -> None:
+        "With confirms returns once the broker has persisted the message"
+        if self._connection is None:
+            # no lock on the hot path once connected
+            await self.connect()
+        if not self.settings.rabbitmq_publisher_confirms:
+            async with self._channel_pool.acquire() as channel:
+                await self.reopen_closed(channel)
+                await self.publish(channel, message)
+            return
+
+        await self.reopen_closed(self._confirm_channel)
+        await self.publish_confirmed(message)
+
+    async def publish_confirmed(self, message: str) -> None:
+        # released even if the caller is cancelled while waiting
+        async with self._in_flight:
+            try:
+                confirmation = await self.publish(
+                    self._confirm_channel,
+                    message,
+                )
+            except (AMQPError, TimeoutError) as ex:
+                logger.error("Message wasn't confirmed: %s", ex)
+                raise self.publish_error() from ex
+        if not isinstance(confirmation, Basic.Ack):
+            logger.error("Message was rejected: %s", confirmation)
+            raise self.publish_error()
+
+    async def publish(self, channel: AbstractChannel, message: str):
+        return await channel.default_exchange.publish(
+            aio_pika.Message(
+                body=message.encode(),
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            ),
+            routing_key=self.settings.queue_name,
+            timeout=self.settings.rabbitmq_confirm_timeout,
+        )
+
+    @staticmethod
+    async def reopen_closed(channel: AbstractChannel) -> None:
+        if channel.is_closed:
+            # closed by a channel level error, not by a reconnect
+            await channel.reopen()
+
+    @staticmethod
+    def publish_error() -> PublisherError:
+        return PublisherError(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Couldn't queue the message",
+        )
 
-    async def close(self):
+    async def close(self) -> None:
         if not self._connection:
             return
+        await self._channel_pool.close()
         await self._connection.close()
         self._connection = None
-        self._channel = None
+        self._channel_pool = None
+        self._confirm_channel = None
@@ -0,0 +1,63 @@
+import csv
+import io
+from typing import AsyncIterable, AsyncIterator, Callable
+
+from pydantic_core import to_json
+from sqlalchemy import Row
+
+from app.src.delivery.entities import (
+    ExportFormat,
+    GetParcelResponseDTO,
+    convert_row_to_response_dto,
+)
+from app.src.delivery.services.parcels_service import EXPORT_CHUNK_SIZE
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+async def chunked(
+    rows: AsyncIterable[Row],
+) -> AsyncIterator[list[GetParcelResponseDTO]]:
+    # one write to the socket per chunk instead of per row
+    chunk: list[GetParcelResponseDTO] = []
+    async for row in rows:
+        chunk.append(convert_row_to_response_dto(row))
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def export_ndjson(rows: AsyncIterable[Row]) -> AsyncIterator[bytes]:
+    async for chunk in chunked(rows):
+        yield b"".join(to_json(parcel) + b"\n" for parcel in chunk)
+
+
+async def export_csv(rows: AsyncIterable[Row]) -> AsyncIterator[str]:
+    fieldnames = list(GetParcelResponseDTO.model_fields)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    async for chunk in chunked(rows):
+        writer.writerows(parcel.model_dump() for parcel in chunk)
+        yield flush(buffer)
+    if header := flush(buffer):
+        # no parcels at all
+        yield header
+
+
+def flush(buffer: io.StringIO) -> str:
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value
+
+
+EXPORTERS: dict[ExportFormat, Callable[[AsyncIterable[Row]], AsyncIterator]] = {
+    ExportFormat.NDJSON: export_ndjson,
+    ExportFormat.CSV: export_csv,
+}
@@ -1,21 +1,29 @@
 import logging
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import TYPE_CHECKING, Iterable
+from typing import AsyncIterator, Sequence
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import Row, insert, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import joinedload
-from sqlmodel import select
+from sqlmodel import and_, or_, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.src.currency.service import ExchangeRateService
-from app.src.delivery.entities import GetParcelsFilterParams, RegisterParcelDTO
-from app.src.delivery.models import Parcel
-
-if TYPE_CHECKING:
-    from app.src.users.models import User
+from app.src.delivery.entities import (
+    BatchItemStatus,
+    GetParcelsFilterParams,
+    ParcelQuoteDTO,
+    ParcelQuoteResponse,
+    ParcelsCursor,
+    RegisterParcelDTO,
+    RegisterParcelsBatchItemResponse,
+    RegisterParcelWithUserDTO,
+)
+from app.src.delivery.models import Parcel, ParcelType
+from app.src.delivery.services.tariffs import TariffService
 
 
 class ParcelServiceError(HTTPException):
@@ -24,25 +32,25 @@ class ParcelServiceError(HTTPException):
 
 logger = logging.getLogger(__name__)
 
+EXPORT_CHUNK_SIZE = 1000
+# a batch racing with another one is resolved again once
+BATCH_INSERT_ATTEMPTS = 2
+
 
 @dataclass
 class ParcelService:
     db_session: AsyncSession
     exchange_service: ExchangeRateService
+    tariff_service: TariffService
 
     async def get_parcel(
         self,
-        user: "User",
+        user_id: UUID,
         parcel_id=UUID,
     ) -> "Parcel":
         async with self.db_session as session:
-            statement = (
-                select(Parcel)
-                .options(joinedload(Parcel.parcel_type))
-                .where(Parcel.user_id == user.id, Parcel.id == parcel_id)
-            )
             results = await session.exec(
-                statement,
+                self.get_parcel_statement(user_id, parcel_id),
             )
             parcel = results.first()
         if not parcel:
@@ -54,23 +62,107 @@ class ParcelService:
 
     async def get_parcels(
         self,
-        user: "User",
+        user_id: UUID,
         filter_query: GetParcelsFilterParams,
-    ) -> Iterable["Parcel"]:
+    ) -> Sequence[Row]:
+        "Returns projected rows with GetParcelResponseDTO columns"
         async with self.db_session as session:
-            statement = (
-                select(Parcel)
-                .options(joinedload(Parcel.parcel_type))
-                .where(Parcel.user_id == user.id)
-            )
-            statement = self.apply_filters(statement, filter_query)
             results = await session.exec(
-                statement.offset(filter_query.offset).limit(filter_query.limit),
+                self.get_parcels_statement(user_id, filter_query),
             )
         parcels = results.all()
 
         return parcels
 
+    @staticmethod
+    def get_parcel_statement(user_id: UUID, parcel_id: UUID):
+        return (
+            select(Parcel)
+            .options(joinedload(Parcel.parcel_type))
+            .where(Parcel.user_id == user_id, Parcel.id == parcel_id)
+        )
+
+    async def stream_parcels(self, user_id: UUID) -> AsyncIterator[Row]:
+        "Yields all user parcels as projected rows through a server cursor"
+        async with self.db_session as session:
+            results = await session.stream(
+                self.get_user_parcels_statement(user_id)
+                .order_by(Parcel.created_at.desc(), Parcel.id.desc())
+                .execution_options(yield_per=EXPORT_CHUNK_SIZE),
+            )
+            async for row in results:
+                yield row
+
+    @staticmethod
+    def get_user_parcels_statement(user_id: UUID):
+        # plain columns skip ORM hydration and identity map bookkeeping
+        return (
+            select(
+                Parcel.id,
+                Parcel.name,
+                Parcel.weight,
+                Parcel.dollar_price,
+                Parcel.delivery_price,
+                ParcelType.name.label("parcel_type_name"),
+                Parcel.user_id,
+                Parcel.created_at,
+            )
+            .join(ParcelType, isouter=True)
+            .where(Parcel.user_id == user_id)
+        )
+
+    def get_parcels_statement(
+        self,
+        user_id: UUID,
+        filter_query: GetParcelsFilterParams,
+    ):
+        statement = self.get_user_parcels_statement(user_id)
+        statement = self.apply_filters(statement, filter_query)
+        return self.apply_pagination(statement, filter_query)
+
+    def apply_pagination(
+        self,
+        statement,
+        filter_query: GetParcelsFilterParams,
+    ):
+        # newest first, id breaks ties so the order is total
+        statement = statement.order_by(
+            Parcel.created_at.desc(),
+            Parcel.id.desc(),
+        ).limit(filter_query.limit)
+        if not filter_query.cursor:
+            return statement.offset(filter_query.offset)
+        try:
+            cursor = ParcelsCursor.decode(filter_query.cursor)
+        except ValueError as ex:
+            raise ParcelServiceError(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor",
+            ) from ex
+        # seek past the cursor instead of skipping rows with OFFSET
+        return statement.where(
+            or_(
+                Parcel.created_at < cursor.created_at,
+                and_(
+                    Parcel.created_at == cursor.created_at,
+                    Parcel.id < cursor.id,
+                ),
+            ),
+        )
+
+    @staticmethod
+    def get_next_cursor(
+        parcels: Sequence[Row],
+        filter_query: GetParcelsFilterParams,
+    ) -> str | None:
+        if not parcels or len(parcels) < filter_query.limit:
+            return None
+        last_parcel = parcels[-1]
+        return ParcelsCursor(
+            created_at=last_parcel.created_at,
+            id=last_parcel.id,
+        ).encode()
+
     def apply_filters(self, statement, filter_query: GetParcelsFilterParams):
         if filter_query.page_type:
             statement = statement.where(
@@ -79,67 +171,340 @@ class ParcelService:
         if filter_query.with_delivery_price is not None:
             statement = (
                 statement.where(
-                    Parcel.delivery_price is None,
+                    Parcel.delivery_price.is_(None),
                 )
                 if filter_query.with_delivery_price is False
                 else statement.where(
-                    Parcel.delivery_price is not None,
+                    Parcel.delivery_price.is_not(None),
                 )
             )
         return statement
 
     async def create_parcel(
         self,
-        user: "User",
+        user_id: UUID,
         parcel_dto: RegisterParcelDTO,
     ) -> Parcel:
+        new_parcel = Parcel(user_id=user_id, **parcel_dto.model_dump())
+        new_parcel.delivery_price = await self.calculate_delivery(new_parcel)
         async with self.db_session as session:
-            return await self.check_create_request(
+            # insert first, retries and races hit the unique request_id
+            if await self.insert_parcel(new_parcel, session):
+                return new_parcel
+            # saved by this or an earlier request
+            if parcel := await self.check_create_request(
+                user_id,
                 parcel_dto.request_id,
                 session=session,
-            ) or await self.add_new_parcel(user, parcel_dto, session)
-
-    async def calculate_delivery(self, parcel: Parcel) -> Decimal:
-        usd_price = Decimal(
-            await self.exchange_service.get_currency("USD"),
+            ):
+                return parcel
+        # e.g. an unknown parcel type, no parcel with this request_id
+        raise ParcelServiceError(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Couldn't add parcel",
         )
-        delivery_price = (
-            parcel.dollar_price * Decimal(0.01)
-            + Decimal(parcel.weight) * Decimal(0.5)
-        ) * usd_price
-        return delivery_price
 
-    async def add_new_parcel(
+    async def insert_parcel(
         self,
-        user: "User",
-        parcel_dto: RegisterParcelDTO,
+        new_parcel: Parcel,
         session: AsyncSession,
-    ) -> Parcel:
-        new_parcel = Parcel(
-            user=user,
-            **parcel_dto.model_dump(),
-        )
-        new_parcel.delivery_price = await self.calculate_delivery(new_parcel)
-        session.add(new_parcel)
-
+    ) -> bool:
+        "Returns False when the parcel violates a unique key"
+        # a plain INSERT, one statement on every dialect
         try:
+            await session.exec(insert(Parcel).values(new_parcel.model_dump()))
             await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            return False
         except SQLAlchemyError as ex:
             logger.error(ex)
+            await session.rollback()
             raise ParcelServiceError(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Couldn't add parcel",
             ) from ex
-        await session.refresh(new_parcel)
-        return new_parcel
+        return True
+
+    async def create_parcels(
+        self,
+        user_id: UUID,
+        parcel_dtos: Sequence[RegisterParcelDTO],
+    ) -> list[RegisterParcelsBatchItemResponse]:
+        "Registers a batch of parcels in one transaction"
+        usd_price = await self.get_usd_price()
+        user_requests = {
+            parcel_dto.request_id: user_id for parcel_dto in parcel_dtos
+        }
+        async with self.db_session as session:
+            for _ in range(BATCH_INSERT_ATTEMPTS):
+                saved_parcels = await self.check_create_requests(
+                    user_requests,
+                    session=session,
+                )
+                results, new_parcels = self.split_batch(
+                    user_id,
+                    parcel_dtos,
+                    saved_parcels,
+                    usd_price,
+                )
+                if not new_parcels or await self.insert_parcels(
+                    new_parcels,
+                    session,
+                ):
+                    return results
+        raise self.batch_error()
+
+    async def create_users_parcels(
+        self,
+        parcel_dtos: Sequence[RegisterParcelWithUserDTO],
+    ) -> None:
+        "Registers parcels of many users in one transaction"
+        usd_price = await self.get_usd_price()
+        user_requests = {
+            parcel_dto.request_id: parcel_dto.user_id
+            for parcel_dto in parcel_dtos
+        }
+        async with self.db_session as session:
+            for _ in range(BATCH_INSERT_ATTEMPTS):
+                saved_parcels = await self.check_create_requests(
+                    user_requests,
+                    session=session,
+                )
+                new_parcels = self.get_users_new_parcels(
+                    parcel_dtos,
+                    saved_parcels,
+                    usd_price,
+                )
+                if not new_parcels or await self.insert_parcels(
+                    new_parcels,
+                    session,
+                ):
+                    return
+        raise self.batch_error()
+
+    def get_users_new_parcels(
+        self,
+        parcel_dtos: Sequence[RegisterParcelWithUserDTO],
+        saved_parcels: dict[UUID, UUID],
+        usd_price: Decimal,
+    ) -> list[dict]:
+        new_parcels: list[dict] = []
+        for parcel_dto in parcel_dtos:
+            # redelivered or repeated inside the batch
+            if parcel_dto.request_id in saved_parcels:
+                continue
+            new_parcel = Parcel(**parcel_dto.model_dump())
+            new_parcel.delivery_price = self.calculate_delivery_price(
+                new_parcel,
+                usd_price,
+            )
+            saved_parcels[parcel_dto.request_id] = new_parcel.id
+            new_parcels.append(new_parcel.model_dump())
+        return new_parcels
+
+    def split_batch(
+        self,
+        user_id: UUID,
+        parcel_dtos: Sequence[RegisterParcelDTO],
+        saved_parcels: dict[UUID, UUID],
+        usd_price: Decimal,
+    ) -> tuple[list[RegisterParcelsBatchItemResponse], list[dict]]:
+        results: list[RegisterParcelsBatchItemResponse] = []
+        new_parcels: list[dict] = []
+        for parcel_dto in parcel_dtos:
+            if parcel_id := saved_parcels.get(parcel_dto.request_id):
+                results.append(
+                    RegisterParcelsBatchItemResponse(
+                        request_id=parcel_dto.request_id,
+                        parcel_id=parcel_id,
+                        status=BatchItemStatus.EXISTING,
+                    ),
+                )
+                continue
+            new_parcel = Parcel(user_id=user_id, **parcel_dto.model_dump())
+            new_parcel.delivery_price = self.calculate_delivery_price(
+                new_parcel,
+                usd_price,
+            )
+            # repeated request_id inside the batch resolves to the first one
+            saved_parcels[parcel_dto.request_id] = new_parcel.id
+            new_parcels.append(new_parcel.model_dump())
+            results.append(
+                RegisterParcelsBatchItemResponse(
+                    request_id=parcel_dto.request_id,
+                    parcel_id=new_parcel.id,
+                    status=BatchItemStatus.CREATED,
+                ),
+            )
+        return results, new_parcels
+
+    async def insert_parcels(
+        self,
+        new_parcels: list[dict],
+        session: AsyncSession,
+    ) -> bool:
+        "Returns False when a parcel violates a unique key"
+        # single multi-row INSERT
+        try:
+            await session.exec(insert(Parcel).values(new_parcels))
+            await session.commit()
+        except IntegrityError as ex:
+            # e.g. a concurrent request saved one of the parcels
+            logger.warning(ex)
+            await session.rollback()
+            return False
+        except SQLAlchemyError as ex:
+            logger.error(ex)
+            await session.rollback()
+            raise self.batch_error() from ex
+        return True
+
+    @staticmethod
+    def batch_error() -> ParcelServiceError:
+        return ParcelServiceError(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Couldn't add parcels",
+        )
+
+    async def check_create_requests(
+        self,
+        user_requests: dict[UUID, UUID],
+        session: AsyncSession,
+    ) -> dict[UUID, UUID]:
+        "Returns ids of parcels the users already saved by their request_id"
+        result = await session.exec(
+            select(Parcel.request_id, Parcel.id, Parcel.user_id).where(
+                Parcel.request_id.in_(user_requests),
+                Parcel.user_id.in_(set(user_requests.values())),
+            ),
+        )
+        # request_id of another user in the batch isn't a match
+        return {
+            row.request_id: row.id
+            for row in result.all()
+            if user_requests[row.request_id] == row.user_id
+        }
+
+    async def reprice_parcels(
+        self,
+        chunk_size: int,
+        *,
+        only_missing: bool = True,
+    ) -> int:
+        "Recalculates delivery prices chunk by chunk, returns parcels count"
+        usd_price = await self.get_usd_price()
+        repriced = 0
+        last_id: UUID | None = None
+        while chunk := await self.get_parcels_to_price(
+            chunk_size,
+            after_id=last_id,
+            only_missing=only_missing,
+        ):
+            await self.update_delivery_prices(
+                self.price_chunk(chunk, usd_price),
+            )
+            repriced += len(chunk)
+            last_id = chunk[-1].id
+            logger.info("%s parcels repriced", repriced)
+        return repriced
+
+    async def get_parcels_to_price(
+        self,
+        chunk_size: int,
+        *,
+        after_id: UUID | None,
+        only_missing: bool,
+    ) -> Sequence[Row]:
+        # keyset scan by id, every chunk is a short query
+        statement = (
+            select(
+                Parcel.id,
+                Parcel.weight,
+                Parcel.dollar_price,
+                Parcel.parcel_type_id,
+            )
+            .order_by(Parcel.id)
+            .limit(chunk_size)
+        )
+        if after_id is not None:
+            statement = statement.where(Parcel.id > after_id)
+        if only_missing:
+            statement = statement.where(Parcel.delivery_price.is_(None))
+        async with self.db_session as session:
+            results = await session.exec(statement)
+            return results.all()
+
+    def price_chunk(
+        self,
+        chunk: Sequence[Row],
+        usd_price: Decimal,
+    ) -> list[dict]:
+        return [
+            {
+                "id": row.id,
+                "delivery_price": self.calculate_delivery_price(row, usd_price),
+            }
+            for row in chunk
+        ]
+
+    async def update_delivery_prices(self, prices: list[dict]) -> None:
+        # bulk UPDATE by primary key, one transaction per chunk
+        async with self.db_session as session:
+            await session.exec(update(Parcel), params=prices)
+            await session.commit()
+
+    async def quote_parcels(
+        self,
+        quote_dtos: Sequence[ParcelQuoteDTO],
+    ) -> list[ParcelQuoteResponse]:
+        "Prices parcels without saving them"
+        usd_price = await self.get_usd_price()
+        return [
+            ParcelQuoteResponse(
+                **quote_dto.model_dump(),
+                delivery_price=self.calculate_delivery_price(
+                    quote_dto,
+                    usd_price,
+                ),
+            )
+            for quote_dto in quote_dtos
+        ]
+
+    async def get_usd_price(self) -> Decimal:
+        return Decimal(
+            await self.exchange_service.get_currency("USD"),
+        )
+
+    async def calculate_delivery(self, parcel: Parcel) -> Decimal:
+        return self.calculate_delivery_price(
+            parcel,
+            await self.get_usd_price(),
+        )
+
+    def calculate_delivery_price(
+        self,
+        parcel: Parcel,
+        usd_price: Decimal,
+    ) -> Decimal:
+        return self.tariff_service.get(parcel.parcel_type_id).price(
+            parcel.dollar_price,
+            parcel.weight,
+            usd_price,
+        )
 
     async def check_create_request(
         self,
+        user_id: UUID,
         request_id: UUID,
         session: AsyncSession,
     ) -> Parcel | None:
+        # request_id of another user is a conflict, not a retry
         result = await session.exec(
-            select(Parcel).where(Parcel.request_id == request_id),
+            select(Parcel).where(
+                Parcel.request_id == request_id,
+                Parcel.user_id == user_id,
+            ),
         )
         if parcel := result.first():
             logger.info("%s request checked, found saved entity", request_id)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+from types import MappingProxyType
+from typing import Mapping
+from uuid import UUID
+
+from sqlmodel import select
+
+from app.db import DatabaseSessionManager, DBError
+from app.src.delivery.models import (
+    DEFAULT_PRICE_RATE,
+    DEFAULT_WEIGHT_RATE,
+    ParcelType,
+)
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal("0.01")
+
+
+@dataclass(frozen=True, slots=True)
+class Tariff:
+    price_rate: Decimal
+    weight_rate: Decimal
+
+    def price(
+        self,
+        dollar_price: Decimal,
+        weight: float,
+        usd_price: Decimal,
+    ) -> Decimal:
+        delivery_price = (
+            dollar_price * self.price_rate + Decimal(weight) * self.weight_rate
+        ) * usd_price
+        # same scale as the column, the row isn't reloaded after insert
+        return delivery_price.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+DEFAULT_TARIFF = Tariff(
+    price_rate=DEFAULT_PRICE_RATE,
+    weight_rate=DEFAULT_WEIGHT_RATE,
+)
+
+Tariffs = Mapping[UUID, Tariff]
+
+
+@dataclass
+class TariffService:
+    "Per parcel type tariffs, kept in memory and reloaded when changed"
+
+    session_manager: DatabaseSessionManager
+    default: Tariff = DEFAULT_TARIFF
+
+    _tariffs: Tariffs = field(
+        init=False,
+        default_factory=lambda: MappingProxyType({}),
+    )
+
+    def get(self, parcel_type_id: UUID | None) -> Tariff:
+        # parcels without a known type are priced by the default tariff
+        return self._tariffs.get(parcel_type_id, self.default)
+
+    async def load(self) -> None:
+        # the table is swapped whole, readers never see a partial update
+        self._tariffs = MappingProxyType(await self.fetch())
+        logger.info("%s tariffs loaded", len(self._tariffs))
+
+    async def refresh(self) -> bool:
+        "Reloads tariffs if their rates changed, returns True if reloaded"
+        tariffs = await self.fetch()
+        if tariffs == self._tariffs:
+            return False
+        self._tariffs = MappingProxyType(tariffs)
+        logger.info("%s tariffs reloaded", len(tariffs))
+        return True
+
+    async def fetch(self) -> dict[UUID, Tariff]:
+        # compared by the rates themselves, a raw UPDATE doesn't bump
+        # updated_at, the table holds a handful of rows
+        async with self.session_manager.session() as session:
+            results = await session.exec(
+                select(
+                    ParcelType.id,
+                    ParcelType.price_rate,
+                    ParcelType.weight_rate,
+                ),
+            )
+            return {
+                row.id: Tariff(
+                    price_rate=row.price_rate,
+                    weight_rate=row.weight_rate,
+                )
+                for row in results.all()
+            }
+
+    async def run_refresher(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except DBError as ex:
+                logger.error("Tariffs refresh failed: %s", ex)
@@ -1,14 +1,17 @@
 import asyncio
-import json
 import logging
+import time
 from dataclasses import dataclass, field
 
 import aio_pika
+from aio_pika.abc import AbstractQueue
 from dishka import AsyncContainer
 from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.config import Settings
 from app.di import get_container
+from app.src.currency.service import ExchangeRateError
 from app.src.delivery.entities import (
     RegisterParcelDTO,
     RegisterParcelWithUserDTO,
@@ -21,6 +24,28 @@ from app.src.users.services import UserService, UserServiceError
 
 logger = logging.getLogger(__name__)
 
+ParsedMessage = tuple[aio_pika.IncomingMessage, RegisterParcelWithUserDTO]
+
+# attempts made, the failed one included
+ATTEMPTS_HEADER = "x-attempts"
+ERROR_HEADER = "x-error"
+MAX_ERROR_LENGTH = 500
+
+HANDLER_ERRORS = (
+    SQLAlchemyError,
+    ExchangeRateError,
+    UserServiceError,
+    ParcelServiceError,
+)
+
+
+def get_retry_queue_name(queue_name: str, attempt: int) -> str:
+    return f"{queue_name}.retry.{attempt}"
+
+
+def get_dead_letter_queue_name(queue_name: str) -> str:
+    return f"{queue_name}.dead"
+
 
 class BackgroundWorkerError(Exception):
     pass
@@ -34,15 +59,40 @@ class BackgroundWorkerService:
     channel: aio_pika.Channel | None = field(init=False)
     connection: aio_pika.Connection | None = field(init=False)
     container: AsyncContainer = field(init=False)
+    handlers: asyncio.Semaphore = field(init=False)
+    handled: int = field(init=False, default=0)
+    throughput_reporter: asyncio.Task | None = field(init=False, default=None)
+    # micro-batching, see collect_message
+    batch: list[aio_pika.IncomingMessage] = field(
+        init=False,
+        default_factory=list,
+    )
+    batch_timer: asyncio.Task | None = field(init=False, default=None)
+    batch_lock: asyncio.Lock = field(init=False, default_factory=asyncio.Lock)
 
     def __post_init__(self):
         self.channel = None
         self.connection = None
         self.container = get_container()
+        self.handlers = asyncio.Semaphore(self.settings.worker_concurrency)
 
     async def connect(self):
         if self.connection:
             return
+        await self.open_channel()
+        queue = await self.declare_queues()
+        await queue.consume(
+            self.collect_message
+            if self.settings.worker_batch_size
+            else self.process_message,
+        )
+        self.throughput_reporter = asyncio.create_task(
+            self.report_throughput(self.settings.worker_report_interval),
+        )
+
+        logger.info("Package worker connected and waiting for messages")
+
+    async def open_channel(self) -> None:
         self.connection = await aio_pika.connect_robust(
             host=self.settings.rabbitmq_host,
             port=self.settings.rabbitmq_port,
@@ -50,48 +100,272 @@ class BackgroundWorkerService:
             password=self.settings.rabbitmq_password,
         )
         self.channel = await self.connection.channel()
-        await self.channel.set_qos(prefetch_count=1)
+        # prefetch above concurrency keeps the next messages ready
+        await self.channel.set_qos(
+            prefetch_count=self.settings.worker_prefetch_count,
+        )
 
-        queue = await self.channel.declare_queue(
-            self.settings.queue_name,
+    async def declare_queues(self) -> AbstractQueue:
+        "Declares the queue with its retry queues and the dead letter queue"
+        queue_name = self.settings.queue_name
+        for attempt in range(1, self.settings.worker_max_attempts):
+            await self.channel.declare_queue(
+                get_retry_queue_name(queue_name, attempt),
+                durable=True,
+                arguments={
+                    # expired messages go back to the queue
+                    "x-message-ttl": self.get_retry_delay(attempt),
+                    "x-dead-letter-exchange": "",
+                    "x-dead-letter-routing-key": queue_name,
+                },
+            )
+        await self.channel.declare_queue(
+            get_dead_letter_queue_name(queue_name),
             durable=True,
         )
+        return await self.channel.declare_queue(queue_name, durable=True)
 
-        await queue.consume(self.process_message)
-
-        logger.info("Package worker connected and waiting for messages")
+    def get_retry_delay(self, attempt: int) -> int:
+        "Exponential backoff, milliseconds"
+        return self.settings.worker_retry_delay_ms * 2 ** (attempt - 1)
 
     async def process_message(self, message: aio_pika.IncomingMessage):
-        async with message.process():
+        # every message is its own task, handlers run concurrently
+        # requeued if it couldn't even be moved to a retry queue
+        async with self.handlers, message.process(requeue=True):
+            try:
+                parcel = RegisterParcelWithUserDTO.model_validate_json(
+                    message.body,
+                )
+            except ValidationError as ex:
+                # malformed, retrying won't help
+                await self.dead_letter(message, ex)
+                return
             try:
-                body = json.loads(message.body.decode())
-                logger.debug(body)
-            except (aio_pika.AMQPException, aio_pika.MessageProcessError) as e:
-                logger.error(f"Error processing message: {e}")
-                await message.reject(requeue=True)
+                await self.handle_parcel(parcel)
+            except Exception as ex:
+                # unexpected errors too, a requeue would loop without a limit
+                await self.retry_later(message, ex)
                 return
+            self.handled += 1
 
-            await self.handle_parcel(body)
+    async def retry_later(
+        self,
+        message: aio_pika.IncomingMessage,
+        error: Exception,
+    ) -> None:
+        attempts = self.get_attempts(message)
+        if attempts >= self.settings.worker_max_attempts:
+            await self.dead_letter(message, error)
+            return
+        logger.warning("Parcel failed %s times, retrying: %s", attempts, error)
+        await self.republish(
+            message,
+            get_retry_queue_name(self.settings.queue_name, attempts),
+            error,
+        )
 
-    async def handle_parcel(self, message_body) -> None:
-        try:
-            message: RegisterParcelWithUserDTO = (
-                RegisterParcelWithUserDTO.model_validate(message_body)
-            )
-            user_service: UserService = await self.container.get(UserService)
-            parcel_service: ParcelService = await self.container.get(
-                ParcelService,
-            )
-            parcel = await parcel_service.create_parcel(
-                user=await user_service.get_or_create(message.user_id),
-                parcel_dto=RegisterParcelDTO.model_validate(
-                    message,
+    async def dead_letter(
+        self,
+        message: aio_pika.IncomingMessage,
+        error: Exception,
+    ) -> None:
+        logger.error("Parcel message dead-lettered: %s", error)
+        await self.republish(
+            message,
+            get_dead_letter_queue_name(self.settings.queue_name),
+            error,
+        )
+
+    async def republish(
+        self,
+        message: aio_pika.IncomingMessage,
+        routing_key: str,
+        error: Exception,
+    ) -> None:
+        # confirmed before the original is acked
+        await self.channel.default_exchange.publish(
+            aio_pika.Message(
+                body=message.body,
+                headers={
+                    **(message.headers or {}),
+                    ATTEMPTS_HEADER: self.get_attempts(message),
+                    ERROR_HEADER: str(error)[:MAX_ERROR_LENGTH],
+                },
+                content_type=message.content_type,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            ),
+            routing_key=routing_key,
+        )
+
+    @staticmethod
+    def get_attempts(message: aio_pika.IncomingMessage) -> int:
+        return int((message.headers or {}).get(ATTEMPTS_HEADER, 0)) + 1
+
+    async def replay_dead_letters(self, limit: int) -> int:
+        "Moves dead-lettered messages back to the queue, attempts start over"
+        await self.open_channel()
+        await self.declare_queues()
+        dead_letters = await self.channel.get_queue(
+            get_dead_letter_queue_name(self.settings.queue_name),
+        )
+        replayed = 0
+        while replayed < limit and (
+            message := await dead_letters.get(fail=False)
+        ):
+            headers = dict(message.headers or {})
+            headers.pop(ATTEMPTS_HEADER, None)
+            headers.pop(ERROR_HEADER, None)
+            await self.channel.default_exchange.publish(
+                aio_pika.Message(
+                    body=message.body,
+                    headers=headers,
+                    content_type=message.content_type,
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
                 ),
+                routing_key=self.settings.queue_name,
             )
+            await message.ack()
+            replayed += 1
+        return replayed
+
+    async def handle_parcel(self, message: RegisterParcelWithUserDTO) -> None:
+        try:
+            # every message gets its own db session
+            async with self.container() as request_container:
+                user_service: UserService = await request_container.get(
+                    UserService,
+                )
+                parcel_service: ParcelService = await request_container.get(
+                    ParcelService,
+                )
+                await user_service.ensure_user(message.user_id)
+                parcel = await parcel_service.create_parcel(
+                    user_id=message.user_id,
+                    # a subclass instance would be kept as is, user_id too
+                    parcel_dto=RegisterParcelDTO.model_validate(
+                        message.model_dump(exclude={"user_id"}),
+                    ),
+                )
             logger.info("Worker handled parcel: %s", parcel)
-        except (ValidationError, UserServiceError, ParcelServiceError) as ex:
+        except HANDLER_ERRORS as ex:
             raise BackgroundWorkerError(ex) from ex
 
+    async def collect_message(self, message: aio_pika.IncomingMessage):
+        "Handles messages in batches of N or whatever came in T ms"
+        self.batch.append(message)
+        if len(self.batch) >= self.settings.worker_batch_size:
+            if self.batch_timer:
+                self.batch_timer.cancel()
+                self.batch_timer = None
+            await self.flush_batch()
+        elif self.batch_timer is None:
+            self.batch_timer = asyncio.create_task(self.flush_batch_later())
+
+    async def flush_batch_later(self) -> None:
+        await asyncio.sleep(self.settings.worker_batch_timeout_ms / 1000)
+        self.batch_timer = None
+        await self.flush_batch()
+
+    async def flush_batch(self) -> None:
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        # one batch at a time, ack with multiple=True covers only this batch
+        async with self.batch_lock:
+            await self.process_batch(batch)
+
+    async def process_batch(
+        self,
+        messages: list[aio_pika.IncomingMessage],
+    ) -> None:
+        try:
+            await self.handle_batch(messages)
+        except Exception as ex:
+            # e.g. redis or a dead letter publish failed, on the timer path
+            # nobody would see it and the batch would stay unacked
+            logger.error("Batch failed, handling one by one: %s", ex)
+            await self.process_one_by_one(messages)
+
+    async def process_one_by_one(
+        self,
+        messages: list[aio_pika.IncomingMessage],
+    ) -> None:
+        for message in messages:
+            if message.processed:
+                continue
+            try:
+                await self.process_message(message)
+            except Exception as ex:
+                # already requeued by message.process, go on with the rest
+                logger.error("Parcel message requeued: %s", ex)
+
+    async def handle_batch(
+        self,
+        messages: list[aio_pika.IncomingMessage],
+    ) -> None:
+        parsed = await self.parse_batch(messages)
+        if not parsed:
+            return
+        await self.handle_parcels([parcel for _, parcel in parsed])
+        last_message = max(
+            (message for message, _ in parsed),
+            key=lambda message: message.delivery_tag,
+        )
+        await last_message.ack(multiple=True)
+        self.handled += len(parsed)
+
+    async def parse_batch(
+        self,
+        messages: list[aio_pika.IncomingMessage],
+    ) -> list[ParsedMessage]:
+        parsed: list[ParsedMessage] = []
+        for message in messages:
+            try:
+                parsed.append(
+                    (
+                        message,
+                        RegisterParcelWithUserDTO.model_validate_json(
+                            message.body,
+                        ),
+                    ),
+                )
+            except ValidationError as ex:
+                await self.dead_letter(message, ex)
+                await message.ack()
+        return parsed
+
+    async def handle_parcels(
+        self,
+        parcels: list[RegisterParcelWithUserDTO],
+    ) -> None:
+        try:
+            async with self.container() as request_container:
+                user_service: UserService = await request_container.get(
+                    UserService,
+                )
+                parcel_service: ParcelService = await request_container.get(
+                    ParcelService,
+                )
+                await user_service.ensure_users(
+                    {parcel.user_id for parcel in parcels},
+                )
+                await parcel_service.create_users_parcels(parcels)
+            logger.info("Worker handled %s parcels", len(parcels))
+        except HANDLER_ERRORS as ex:
+            raise BackgroundWorkerError(ex) from ex
+
+    async def report_throughput(self, interval: float) -> None:
+        handled, started = self.handled, time.perf_counter()
+        while True:
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            logger.info(
+                "Worker handled %.1f messages/s",
+                (self.handled - handled) / (now - started),
+            )
+            handled, started = self.handled, now
+
     async def run(self):
         await self.connect()
         try:
@@ -102,6 +376,13 @@ class BackgroundWorkerService:
     async def close(self):
         if not self.connection:
             return
+        if self.throughput_reporter:
+            self.throughput_reporter.cancel()
+            self.throughput_reporter = None
+        if self.batch_timer:
+            # unacked messages are redelivered
+            self.batch_timer.cancel()
+            self.batch_timer = None
         await self.connection.close()
         self.connection = None
         self.channel = None
@@ -5,7 +5,9 @@ from uuid import UUID
 from fastapi import HTTPException, status
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.cache import TTLCache
 from app.config import Settings
+from app.db import insert_or_ignore
 from app.src.users.models import User
 
 
@@ -22,30 +24,59 @@ USER_ID_KEY: Final[str] = "user_id"
 TEST_USER_ID = UUID("76ebc6a6-a48f-4dee-a95f-db2c63ef62d3")
 
 
+class KnownUsersCache(TTLCache[UUID, bool]):
+    "Ids of users already saved to the db"
+
+
 @dataclass
 class UserService:
     db_session: AsyncSession
     settings: Settings
+    known_users: KnownUsersCache
 
-    async def get_user(self, session: dict) -> User:
+    async def get_user_id(self, session: dict) -> UUID:
+        "Returns the session user id, the user is saved on first sight"
+        user_id = self.get_session_user_id(session)
+        await self.ensure_user(user_id)
+        return user_id
+
+    @staticmethod
+    def get_session_user_id(session: dict) -> UUID:
         user_id = session.get(USER_ID_KEY)
         if not user_id:
             raise NotAuthorizedError(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="No user session",
             )
-        return await self.get_or_create(user_id=user_id)
+        try:
+            return UUID(str(user_id))
+        except ValueError as ex:
+            raise NotAuthorizedError(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid user session",
+            ) from ex
+
+    async def ensure_user(self, user_id: UUID) -> None:
+        await self.ensure_users({user_id})
 
-    async def get_or_create(self, user_id: UUID) -> User:
+    async def ensure_users(self, user_ids: set[UUID]) -> None:
+        "Saves unknown users with a single INSERT"
+        # known users cost no db round trip
+        new_user_ids = [
+            user_id for user_id in user_ids if not self.known_users.get(user_id)
+        ]
+        if not new_user_ids:
+            return
         async with self.db_session as session:
-            return await session.get(User, user_id) or await self.create_user(
-                user_id=user_id,
-                session=session,
+            await session.exec(
+                insert_or_ignore(
+                    User,
+                    dialect_name=session.bind.dialect.name,
+                    index_elements=("id",),
+                ).values(
+                    [User(id=user_id).model_dump() for user_id in new_user_ids],
+                ),
             )
-
-    async def create_user(self, user_id: UUID, session: AsyncSession) -> User:
-        new_user = User(id=user_id)
-        session.add(new_user)
-        await session.commit()
-        await session.refresh(new_user)
-        return new_user
+            await session.commit()
+        for user_id in new_user_ids:
+            self.known_users.set(user_id, value=True)
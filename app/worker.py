@@ -0,0 +1,140 @@
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+import signal
+import time
+from dataclasses import dataclass, field
+from multiprocessing.process import BaseProcess
+from typing import Annotated
+
+import typer
+
+from app.config import Settings, get_settings
+from app.ioc import setup_container
+from app.src.currency.service import ExchangeRateService
+from app.src.delivery.services.tariffs import TariffService
+from app.src.delivery.services.worker_service import BackgroundWorkerService
+
+logger = logging.getLogger(__name__)
+
+SUPERVISOR_POLL_INTERVAL = 1
+# a crashing process isn't restarted more often than this, seconds
+RESTART_DELAY = 5
+STOP_TIMEOUT = 30
+
+
+async def run_worker(settings: Settings) -> None:
+    "Consumes the parcels queue with the app container, without FastAPI"
+    container = setup_container(
+        context={
+            Settings: settings,
+            logging.Logger: logger,
+        },
+    )
+    exchange_service = await container.get(ExchangeRateService)
+    tariff_service = await container.get(TariffService)
+    background_tasks = (
+        asyncio.create_task(exchange_service.listen_invalidations()),
+        asyncio.create_task(
+            tariff_service.run_refresher(
+                interval=settings.tariffs_refresh_interval,
+            ),
+        ),
+    )
+    try:
+        worker_service = await container.get(BackgroundWorkerService)
+        await worker_service.run()
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        await container.close()
+
+
+async def serve(settings: Settings) -> None:
+    # SIGTERM stops consuming, unacked messages go back to the queue
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, task.cancel)
+    with contextlib.suppress(asyncio.CancelledError):
+        await run_worker(settings)
+
+
+def worker_process() -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(get_settings()))
+
+
+@dataclass
+class WorkerProcess:
+    process: BaseProcess
+    started_at: float = field(default_factory=time.monotonic)
+    # set once the process exited, restarted after that time
+    restart_at: float | None = None
+
+    @classmethod
+    def start(cls) -> "WorkerProcess":
+        # spawn, children don't inherit the supervisor state
+        process = multiprocessing.get_context("spawn").Process(
+            target=worker_process,
+        )
+        process.start()
+        logger.info("Worker process %s started", process.pid)
+        return cls(process=process)
+
+    def poll(self) -> "WorkerProcess":
+        "Restarts the exited process, without blocking the other ones"
+        if self.process.is_alive():
+            return self
+        now = time.monotonic()
+        if self.restart_at is None:
+            logger.warning(
+                "Worker process %s exited with %s, restarting",
+                self.process.pid,
+                self.process.exitcode,
+            )
+            self.restart_at = max(now, self.started_at + RESTART_DELAY)
+        if now < self.restart_at:
+            return self
+        return self.start()
+
+
+def supervise(processes_num: int) -> None:
+    "Keeps worker processes running until SIGTERM or SIGINT"
+    stopping = False
+
+    def stop(*args) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    workers = [WorkerProcess.start() for _ in range(processes_num)]
+    while not stopping:
+        time.sleep(SUPERVISOR_POLL_INTERVAL)
+        workers = [worker if stopping else worker.poll() for worker in workers]
+
+    for worker in workers:
+        worker.process.terminate()
+    for worker in workers:
+        worker.process.join(STOP_TIMEOUT)
+    logger.info("Worker processes stopped")
+
+
+def main(
+    processes: Annotated[
+        int,
+        typer.Option(min=1, help="Worker processes, each with its own loop"),
+    ] = 1,
+):
+    "Consumes queued parcels outside of the web app"
+    if processes == 1:
+        worker_process()
+        return
+    supervise(processes)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    typer.run(main)
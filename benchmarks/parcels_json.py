@@ -0,0 +1,84 @@
+"""CPU time of rendering a 100 parcels page.
+
+Compares FastAPI's default path (response_model validation,
+jsonable_encoder, stdlib json) with FastJSONResponse.
+
+    export PYTHONPATH=. && uv run python -m benchmarks.parcels_json
+"""
+
+import asyncio
+import logging
+import time
+from decimal import Decimal
+from typing import Iterable
+from uuid import uuid4
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.responses import FastJSONResponse
+from app.src.delivery.entities import (
+    GetParcelResponseDTO,
+    format_delivery_price,
+    format_dollar_price,
+)
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100
+ROUNDS = 2_000
+
+RESPONSE_FIELD = create_model_field(
+    name="Response",
+    type_=Iterable[GetParcelResponseDTO],
+    mode="serialization",
+)
+
+
+def make_page() -> list[GetParcelResponseDTO]:
+    return [
+        GetParcelResponseDTO.model_construct(
+            id=uuid4(),
+            name=f"parcel {num}",
+            weight=float(num),
+            dollar_price=format_dollar_price(Decimal(num)),
+            delivery_price=format_delivery_price(Decimal(num)),
+            parcel_type_name="clothes",
+            user_id=uuid4(),
+        )
+        for num in range(PAGE_SIZE)
+    ]
+
+
+async def default_render(page: list[GetParcelResponseDTO]) -> bytes:
+    content = await serialize_response(
+        field=RESPONSE_FIELD,
+        response_content=(dto for dto in page),
+    )
+    return JSONResponse(content).body
+
+
+async def fast_render(page: list[GetParcelResponseDTO]) -> bytes:
+    return FastJSONResponse(page).body
+
+
+async def measure(name: str, render, page) -> float:
+    started = time.process_time()
+    for _ in range(ROUNDS):
+        await render(page)
+    per_request_us = (time.process_time() - started) / ROUNDS * 1_000_000
+    logger.info("%s: %.0f us cpu per request", name, per_request_us)
+    return per_request_us
+
+
+async def main():
+    page = make_page()
+    default = await measure("default", default_render, page)
+    fast = await measure("fast", fast_render, page)
+    logger.info("saved: %.0f us cpu per request", default - fast)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""Rows per second of the GET /delivery/parcels read path.
+
+Compares the ORM path (Parcel entities with joinedload, validated DTOs)
+with the column projection used by ParcelService.get_parcels.
+
+    export PYTHONPATH=. && uv run python -m benchmarks.parcels_list
+"""
+
+import asyncio
+import logging
+import time
+from decimal import Decimal
+from random import choice, randint
+from unittest.mock import create_autospec
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import joinedload
+from sqlmodel import select
+
+from app.db import DatabaseSessionManager
+from app.src.currency.service import ExchangeRateService
+from app.src.delivery.entities import (
+    GetParcelsFilterParams,
+    convert_parcel_to_response_dto,
+    convert_row_to_response_dto,
+)
+from app.src.delivery.models import Parcel, ParcelType, init_parcel_types
+from app.src.delivery.services.parcels_service import ParcelService
+from app.src.delivery.services.tariffs import TariffService
+from app.src.users.models import User
+
+logger = logging.getLogger(__name__)
+
+PARCELS_NUM = 10_000
+PAGE_SIZE = 100
+ROUNDS = 200
+
+
+async def fill_db(session_manager: DatabaseSessionManager) -> User:
+    await session_manager.init_db()
+    await init_parcel_types(session_manager=session_manager)
+    user = User()
+    async with session_manager.session() as session:
+        parcel_types = (await session.exec(select(ParcelType))).all()
+        session.add(user)
+        session.add_all(
+            Parcel(
+                request_id=uuid4(),
+                name=f"parcel {num}",
+                weight=randint(1, 100),
+                dollar_price=Decimal(randint(1, 100)),
+                delivery_price=Decimal(randint(1, 100)),
+                parcel_type_id=choice(parcel_types).id,
+                user_id=user.id,
+            )
+            for num in range(PARCELS_NUM)
+        )
+        await session.commit()
+    return user
+
+
+async def orm_page(parcel_service: ParcelService, user: User) -> int:
+    statement = parcel_service.apply_pagination(
+        select(Parcel)
+        .options(joinedload(Parcel.parcel_type))
+        .where(Parcel.user_id == user.id),
+        GetParcelsFilterParams(limit=PAGE_SIZE),
+    )
+    async with parcel_service.db_session as session:
+        parcels = (await session.exec(statement)).all()
+    return len([convert_parcel_to_response_dto(parcel) for parcel in parcels])
+
+
+async def projected_page(parcel_service: ParcelService, user: User) -> int:
+    rows = await parcel_service.get_parcels(
+        user_id=user.id,
+        filter_query=GetParcelsFilterParams(limit=PAGE_SIZE),
+    )
+    return len([convert_row_to_response_dto(row) for row in rows])
+
+
+async def measure(name: str, page, parcel_service, user) -> float:
+    rows = 0
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        rows += await page(parcel_service, user)
+    rows_per_second = rows / (time.perf_counter() - started)
+    logger.info("%s: %.0f rows/s", name, rows_per_second)
+    return rows_per_second
+
+
+async def main():
+    session_manager = DatabaseSessionManager(
+        engine=create_async_engine("sqlite+aiosqlite:///"),
+        logger=logger,
+    )
+    user = await fill_db(session_manager)
+    async with session_manager.session() as session:
+        parcel_service = ParcelService(
+            db_session=session,
+            # the read path never converts currencies
+            exchange_service=create_autospec(
+                ExchangeRateService,
+                instance=True,
+            ),
+            tariff_service=TariffService(session_manager=session_manager),
+        )
+        orm = await measure("orm", orm_page, parcel_service, user)
+        projected = await measure(
+            "projected",
+            projected_page,
+            parcel_service,
+            user,
+        )
+    logger.info("speedup: x%.2f", projected / orm)
+    await session_manager.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+import json
+import threading
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import fakeredis
+import httpx
+import pytest
+
+from app.src.currency.service import ExchangeRateService
+
+CB_RESPONSE_PATH = "./tests/app/currency/response.json"
+
+
+@dataclass
+class CBStandIn:
+    "Local stand-in for cbr-xml-daily.ru"
+
+    url: str
+    body: bytes
+    # statuses returned before the successful answers
+    failures: list[int] = field(default_factory=list)
+    client_ports: list[int] = field(default_factory=list)
+
+
+def make_handler(stand_in: CBStandIn) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):  # noqa: N802
+            stand_in.client_ports.append(self.client_address[1])
+            status = (
+                stand_in.failures.pop(0) if stand_in.failures else HTTPStatus.OK
+            )
+            body = stand_in.body if status == HTTPStatus.OK else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def cb_response_json() -> dict:
+    with open(CB_RESPONSE_PATH) as file:
+        return json.load(file)
+
+
+@pytest.fixture
+def cb_stand_in():
+    with open(CB_RESPONSE_PATH, "rb") as file:
+        stand_in = CBStandIn(url="", body=file.read())
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(stand_in))
+    stand_in.url = f"http://127.0.0.1:{server.server_port}/daily_json.js"
+    thread = threading.Thread(
+        target=server.serve_forever,
+        kwargs={"poll_interval": 0.05},
+        daemon=True,
+    )
+    thread.start()
+    yield stand_in
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_exchange_service():
+    def make(redis=None, http_client=None, **kwargs) -> ExchangeRateService:
+        return ExchangeRateService(
+            redis=redis
+            or fakeredis.FakeAsyncRedis(decode_responses=True, version=7),
+            # tests with a real server open the client in their own loop
+            http_client=http_client or httpx.AsyncClient(),
+            **kwargs,
+        )
+
+    return make
@@ -0,0 +1,105 @@
+from http import HTTPStatus
+
+import httpx
+import pytest
+
+from app.src.currency.service import ExchangeRateError
+
+
+@pytest.mark.asyncio
+async def test_fetch_keeps_connection_alive(make_exchange_service, cb_stand_in):
+    async with httpx.AsyncClient() as http_client:
+        service = make_exchange_service(
+            http_client=http_client,
+            cb_url=cb_stand_in.url,
+        )
+        for _ in range(3):
+            assert "Valute" in await service.fetch_cb()
+
+    # one tcp connection for all requests
+    assert len(cb_stand_in.client_ports) == 3
+    assert len(set(cb_stand_in.client_ports)) == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_retries_server_errors(make_exchange_service, cb_stand_in):
+    cb_stand_in.failures = [
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        HTTPStatus.TOO_MANY_REQUESTS,
+    ]
+    async with httpx.AsyncClient() as http_client:
+        service = make_exchange_service(
+            http_client=http_client,
+            cb_url=cb_stand_in.url,
+            retries=2,
+            retry_backoff=0.01,
+        )
+        assert "Valute" in await service.fetch_cb()
+
+    assert len(cb_stand_in.client_ports) == 3
+
+
+@pytest.mark.asyncio
+async def test_fetch_gives_up(make_exchange_service, cb_stand_in):
+    cb_stand_in.failures = [HTTPStatus.BAD_GATEWAY] * 3
+    async with httpx.AsyncClient() as http_client:
+        service = make_exchange_service(
+            http_client=http_client,
+            cb_url=cb_stand_in.url,
+            retries=1,
+            retry_backoff=0.01,
+        )
+        with pytest.raises(ExchangeRateError):
+            await service.fetch_cb()
+
+    assert len(cb_stand_in.client_ports) == 2
+
+
+@pytest.mark.asyncio
+async def test_fetch_does_not_retry_client_errors(
+    make_exchange_service,
+    cb_stand_in,
+):
+    cb_stand_in.failures = [HTTPStatus.NOT_FOUND]
+    async with httpx.AsyncClient() as http_client:
+        service = make_exchange_service(
+            http_client=http_client,
+            cb_url=cb_stand_in.url,
+            retries=2,
+        )
+        with pytest.raises(ExchangeRateError):
+            await service.fetch_cb()
+
+    assert len(cb_stand_in.client_ports) == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_retries_connection_errors(make_exchange_service):
+    async with httpx.AsyncClient() as http_client:
+        service = make_exchange_service(
+            http_client=http_client,
+            # nothing listens there
+            cb_url="http://127.0.0.1:9/daily_json.js",
+            retries=1,
+            retry_backoff=0.01,
+        )
+        with pytest.raises(ExchangeRateError):
+            await service.fetch_cb()
+
+
+@pytest.mark.asyncio
+async def test_fetch_retries_malformed_body(make_exchange_service, cb_stand_in):
+    cb_stand_in.body = b"<html>Under maintenance</html>"
+    async with httpx.AsyncClient() as http_client:
+        service = make_exchange_service(
+            http_client=http_client,
+            cb_url=cb_stand_in.url,
+            retries=1,
+            retry_backoff=0.01,
+        )
+        with pytest.raises(ExchangeRateError) as ex:
+            await service.fetch_cb()
+
+    assert ex.value.status_code == HTTPStatus.BAD_REQUEST
+    assert len(cb_stand_in.client_ports) == 2
+    assert service.circuit_breaker.failures == 1
@@ -1,4 +1,3 @@
-import json
 from decimal import Decimal
 from http import HTTPStatus
 from unittest.mock import AsyncMock, patch
@@ -9,8 +8,10 @@ from httpx import ASGITransport, AsyncClient
 from redis.asyncio import Redis
 
 from app.src.currency.service import (
-    CURRENCY_PREFIX,
+    CURRENCY_RATES_KEY,
+    LAST_GOOD_RATES_KEY,
     CBResponse,
+    CurrenciesResponse,
     CurrencyResponse,
     ExchangeRateService,
 )
@@ -21,9 +22,12 @@ URL = f"/api/v1/currency/{CHECK_CURRENCY}"
 
 
 @pytest.mark.anyio
-async def test_currency(test_app, container: AsyncContainer):
-    with open("./tests/app/currency/response.json") as file:
-        mocked_response_json = json.load(file)
+async def test_currency(
+    test_app,
+    container: AsyncContainer,
+    cb_response_json: dict,
+):
+    mocked_response_json = cb_response_json
     file_cb_response: CBResponse = CBResponse.model_validate(
         mocked_response_json,
     )
@@ -48,7 +52,70 @@ async def test_currency(test_app, container: AsyncContainer):
             )
             == got
         )
-    # check cached value
+    # check cached value, the whole table is cached at once
     redis = await container.get(Redis)
-    cached_value = await redis.get(f"{CURRENCY_PREFIX}{CHECK_CURRENCY}")
-    assert Decimal(cached_value) == got.value
+    cached_rates = await redis.hgetall(CURRENCY_RATES_KEY)
+    assert Decimal(cached_rates[CHECK_CURRENCY]) == got.value
+    assert set(file_cb_response.Valute) <= set(cached_rates)
+
+
+@pytest.mark.anyio
+async def test_currency_table_fetched_once(
+    test_app,
+    container: AsyncContainer,
+    cb_response_json: dict,
+):
+    redis = await container.get(Redis)
+    await redis.delete(CURRENCY_RATES_KEY)
+    fetch_cb = AsyncMock(return_value=cb_response_json)
+
+    with patch.object(ExchangeRateService, "fetch_cb", new=fetch_cb):
+        async with AsyncClient(
+            transport=ASGITransport(app=test_app),
+            base_url="http://test",
+        ) as ac:
+            for currency in ("USD", "EUR", "CNY"):
+                response = await ac.get(f"/api/v1/currency/{currency}")
+                assert response.status_code == HTTPStatus.OK
+            response = await ac.get("/api/v1/currency/XXX")
+            assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    fetch_cb.assert_awaited_once()
+
+
+@pytest.mark.anyio
+async def test_currencies_batch(
+    test_app,
+    container: AsyncContainer,
+    cb_response_json: dict,
+):
+    redis = await container.get(Redis)
+    await redis.delete(CURRENCY_RATES_KEY, LAST_GOOD_RATES_KEY)
+    file_cb_response = CBResponse.model_validate(cb_response_json)
+    fetch_cb = AsyncMock(return_value=cb_response_json)
+
+    with patch.object(ExchangeRateService, "fetch_cb", new=fetch_cb):
+        async with AsyncClient(
+            transport=ASGITransport(app=test_app),
+            base_url="http://test",
+        ) as ac:
+            response = await ac.get(
+                "/api/v1/currency",
+                params={"codes": "usd, EUR,CNY"},
+            )
+            not_found_response = await ac.get(
+                "/api/v1/currency",
+                params={"codes": "USD,XXX"},
+            )
+
+    fetch_cb.assert_awaited_once()
+    assert response.status_code == HTTPStatus.OK
+    got = CurrenciesResponse.model_validate(response.json())
+    assert got.date == file_cb_response.Date
+    assert {
+        currency.currency_name: currency.value for currency in got.currencies
+    } == {
+        code: file_cb_response.Valute[code].Value
+        for code in ("USD", "EUR", "CNY")
+    }
+    assert not_found_response.status_code == HTTPStatus.BAD_REQUEST
@@ -0,0 +1,62 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import fakeredis
+import pytest
+
+from app.cache import TTLCache
+from app.src.currency.service import CBResponse
+
+
+def test_ttl_cache_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("USD", "1")
+    cache.set("EUR", "2")
+    cache.get("USD")
+    cache.set("CNY", "3")
+
+    assert cache.get("EUR") is None
+    assert cache.get("USD") == "1"
+    assert len(cache) == 2
+
+
+def test_ttl_cache_expiration():
+    cache = TTLCache(maxsize=2, ttl=-1)
+    cache.set("USD", "1")
+
+    assert cache.get("USD") is None
+
+
+@pytest.mark.asyncio
+async def test_local_cache_skips_redis(
+    make_exchange_service,
+    cb_response_json: dict,
+):
+    service = make_exchange_service()
+    await service.save_to_cache(CBResponse.model_validate(cb_response_json))
+    value = await service.get_currency("USD")
+
+    with patch.object(service, "redis", new=AsyncMock()) as redis:
+        assert await service.get_currency("USD") == value
+    redis.hmget.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_local_cache_invalidated_by_other_instance(
+    make_exchange_service,
+    cb_response_json: dict,
+):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True, version=7)
+    service = make_exchange_service(redis=redis)
+    other_instance = make_exchange_service(redis=redis)
+    listener = asyncio.create_task(service.listen_invalidations())
+    await asyncio.sleep(0.05)
+
+    service.local_cache.set("USD", "1")
+    await other_instance.save_to_cache(
+        CBResponse.model_validate(cb_response_json),
+    )
+    await asyncio.sleep(0.05)
+    listener.cancel()
+
+    assert service.local_cache.get("USD") is None
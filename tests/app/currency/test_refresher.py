@@ -0,0 +1,90 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from redis.exceptions import RedisError
+
+from app.src.currency import service as currency_service
+from app.src.currency.service import (
+    CURRENCY_RATES_KEY,
+    CBResponse,
+    ExchangeRateService,
+)
+
+
+@pytest.fixture
+def exchange_service(make_exchange_service) -> ExchangeRateService:
+    return make_exchange_service()
+
+
+@pytest.mark.asyncio
+async def test_refresh_delay(
+    exchange_service: ExchangeRateService,
+    cb_response_json: dict,
+):
+    redis = exchange_service.redis
+    # no table, refresh right now
+    assert await exchange_service.get_refresh_delay(100, 10) == 0
+
+    await exchange_service.save_to_cache(
+        CBResponse.model_validate(cb_response_json),
+    )
+    await redis.expire(CURRENCY_RATES_KEY, 50)
+    assert await exchange_service.get_refresh_delay(100, 10) == 40
+    assert await exchange_service.get_refresh_delay(20, 10) == 20
+
+    await redis.persist(CURRENCY_RATES_KEY)
+    assert await exchange_service.get_refresh_delay(100, 10) == 100
+
+
+@pytest.mark.asyncio
+async def test_refresher_fetches_before_expiry(
+    exchange_service: ExchangeRateService,
+    cb_response_json: dict,
+):
+    await exchange_service.save_to_cache(
+        CBResponse.model_validate(cb_response_json),
+    )
+    await exchange_service.redis.expire(CURRENCY_RATES_KEY, 5)
+    fetch_cb = AsyncMock(return_value=cb_response_json)
+
+    with (
+        patch.object(ExchangeRateService, "fetch_cb", new=fetch_cb),
+        patch.object(currency_service, "REFRESH_MIN_DELAY", new=100),
+    ):
+        refresher = asyncio.create_task(
+            exchange_service.run_refresher(interval=100, ahead=10),
+        )
+        await asyncio.sleep(0.05)
+        refresher.cancel()
+
+    fetch_cb.assert_awaited_once()
+    assert await exchange_service.redis.ttl(CURRENCY_RATES_KEY) > 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error",
+    [RedisError("redis is down"), ValueError("unexpected")],
+)
+async def test_refresher_survives_errors(
+    exchange_service: ExchangeRateService,
+    cb_response_json: dict,
+    error: Exception,
+):
+    fetch_cb = AsyncMock(return_value=cb_response_json)
+    ttl = AsyncMock(side_effect=[error, -2, 100])
+
+    with (
+        patch.object(ExchangeRateService, "fetch_cb", new=fetch_cb),
+        patch.object(exchange_service.redis, "ttl", new=ttl),
+        patch.object(currency_service, "REFRESH_MIN_DELAY", new=0),
+    ):
+        refresher = asyncio.create_task(
+            exchange_service.run_refresher(interval=100, ahead=10),
+        )
+        await asyncio.sleep(0.05)
+        assert not refresher.done()
+        refresher.cancel()
+
+    fetch_cb.assert_awaited_once()
@@ -0,0 +1,104 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import fakeredis
+import httpx
+import pytest
+
+from app.src.currency.service import (
+    REFRESH_LEASE_KEY,
+    CBResponse,
+    ExchangeRateService,
+)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_fetch_once(
+    make_exchange_service,
+    cb_response_json: dict,
+):
+    service = make_exchange_service()
+
+    async def slow_fetch_cb(*_):
+        await asyncio.sleep(0.05)
+        return cb_response_json
+
+    fetch_cb = AsyncMock(side_effect=slow_fetch_cb)
+
+    with patch.object(ExchangeRateService, "fetch_cb", new=fetch_cb):
+        values = await asyncio.gather(
+            *(service.get_currency("USD") for _ in range(20)),
+            *(service.get_currency("EUR") for _ in range(20)),
+        )
+
+    fetch_cb.assert_awaited_once()
+    assert len(set(values)) == 2
+    assert not await service.redis.exists(REFRESH_LEASE_KEY)
+
+
+@pytest.mark.asyncio
+async def test_waits_for_lease_holder(
+    make_exchange_service,
+    cb_response_json: dict,
+):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True, version=7)
+    # both services share redis like two app instances
+    lease_holder = make_exchange_service(redis=redis)
+    service = make_exchange_service(redis=redis)
+    await redis.set(REFRESH_LEASE_KEY, "another instance")
+    fetch_cb = AsyncMock(return_value=cb_response_json)
+
+    async def save_later():
+        await asyncio.sleep(0.1)
+        await lease_holder.save_to_cache(
+            CBResponse.model_validate(cb_response_json),
+        )
+
+    with patch.object(ExchangeRateService, "fetch_cb", new=fetch_cb):
+        value, _ = await asyncio.gather(
+            service.get_currency("USD"),
+            save_later(),
+        )
+
+    fetch_cb.assert_not_awaited()
+    assert value
+
+
+@pytest.mark.asyncio
+async def test_lease_outlives_slowest_refresh(
+    make_exchange_service,
+    cb_response_json: dict,
+):
+    service = make_exchange_service(
+        http_client=httpx.AsyncClient(timeout=httpx.Timeout(3, connect=1)),
+        retries=2,
+        retry_backoff=0.2,
+    )
+    # 3 attempts of connect and read plus the backoffs
+    assert service.get_refresh_timeout() == pytest.approx(12.6)
+    lease_ttls = []
+
+    async def fetch_cb(*_):
+        lease_ttls.append(await service.redis.pttl(REFRESH_LEASE_KEY))
+        return cb_response_json
+
+    with patch.object(ExchangeRateService, "fetch_cb", new=fetch_cb):
+        await service.refresh_rates()
+    assert lease_ttls[0] > 12_600
+
+
+@pytest.mark.asyncio
+async def test_keeps_lease_of_another_instance(
+    make_exchange_service,
+    cb_response_json: dict,
+):
+    service = make_exchange_service()
+
+    async def fetch_cb(*_):
+        # the lease expired and another instance took it
+        await service.redis.set(REFRESH_LEASE_KEY, "another instance")
+        return cb_response_json
+
+    with patch.object(ExchangeRateService, "fetch_cb", new=fetch_cb):
+        await service.refresh_rates()
+    assert await service.redis.get(REFRESH_LEASE_KEY) == "another instance"
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from http import HTTPStatus
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from app.circuit_breaker import CircuitBreaker
+from app.src.currency.service import (
+    CURRENCY_RATES_KEY,
+    CBResponse,
+    ExchangeRateError,
+    ExchangeRateService,
+)
+
+
+def test_circuit_breaker():
+    circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    circuit_breaker.record_failure()
+    assert circuit_breaker.allow_request()
+
+    circuit_breaker.record_failure()
+    assert circuit_breaker.is_open
+    assert not circuit_breaker.allow_request()
+
+    circuit_breaker.record_success()
+    assert circuit_breaker.allow_request()
+
+
+def test_circuit_breaker_half_open():
+    circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    circuit_breaker.record_failure()
+
+    # cooldown passed, the probe is allowed
+    assert circuit_breaker.allow_request()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.is_open
+
+
+@pytest.mark.asyncio
+async def test_last_good_rates_served_while_cb_is_down(
+    make_exchange_service,
+    cb_response_json: dict,
+):
+    service = make_exchange_service()
+    await service.save_to_cache(CBResponse.model_validate(cb_response_json))
+    value = await service.get_currency("USD")
+    # the fresh table expired
+    await service.redis.delete(CURRENCY_RATES_KEY)
+    service.local_cache.clear()
+    fetch_cb = AsyncMock(
+        side_effect=ExchangeRateError(status_code=HTTPStatus.BAD_REQUEST),
+    )
+
+    with patch.object(ExchangeRateService, "fetch_cb", new=fetch_cb):
+        assert await service.get_currency("USD") == value
+        # revalidation runs in background
+        await asyncio.sleep(0.01)
+
+    fetch_cb.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_stale_rates_logged_once(
+    make_exchange_service,
+    cb_response_json: dict,
+    caplog: pytest.LogCaptureFixture,
+):
+    service = make_exchange_service()
+    cb_response = CBResponse.model_validate(cb_response_json)
+    await service.save_to_cache(cb_response)
+    await service.redis.delete(CURRENCY_RATES_KEY)
+    fetch_cb = AsyncMock(
+        side_effect=ExchangeRateError(status_code=HTTPStatus.BAD_REQUEST),
+    )
+
+    with (
+        caplog.at_level(logging.INFO),
+        patch.object(ExchangeRateService, "fetch_cb", new=fetch_cb),
+    ):
+        for _ in range(3):
+            service.local_cache.clear()
+            await service.get_currency("USD")
+            await asyncio.sleep(0.01)
+        assert fetch_cb.await_count == 3
+        warnings = [
+            record for record in caplog.records if record.levelname == "WARNING"
+        ]
+        assert len(warnings) == 1
+
+        fetch_cb.side_effect = None
+        fetch_cb.return_value = cb_response_json
+        await service.refresh_rates()
+    assert "no longer served" in caplog.records[-1].getMessage()
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_stops_requests(
+    make_exchange_service,
+    cb_stand_in,
+):
+    cb_stand_in.failures = [HTTPStatus.SERVICE_UNAVAILABLE] * 2
+    async with httpx.AsyncClient() as http_client:
+        service = make_exchange_service(
+            http_client=http_client,
+            cb_url=cb_stand_in.url,
+            retries=0,
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=2,
+                reset_timeout=60,
+            ),
+        )
+        for _ in range(4):
+            with pytest.raises(ExchangeRateError):
+                await service.fetch_cb()
+
+    assert len(cb_stand_in.client_ports) == 2
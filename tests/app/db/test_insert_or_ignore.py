@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app.db import DBError, insert_or_ignore
+from app.src.delivery.models import Parcel
+
+
+@pytest.mark.parametrize(
+    ("dialect", "expected"),
+    [
+        (mysql.dialect(), "ON DUPLICATE KEY UPDATE id = parcels.id"),
+        (sqlite.dialect(), "ON CONFLICT (request_id) DO NOTHING"),
+        (postgresql.dialect(), "ON CONFLICT (request_id) DO NOTHING"),
+    ],
+)
+def test_insert_or_ignore(dialect, expected: str):
+    statement = insert_or_ignore(
+        Parcel,
+        dialect_name=dialect.name,
+        index_elements=("request_id",),
+    )
+    compiled = str(statement.compile(dialect=dialect))
+    assert expected in compiled
+    # data errors must not be turned into warnings
+    assert "IGNORE" not in compiled
+
+
+def test_insert_or_ignore_unsupported():
+    with pytest.raises(DBError):
+        insert_or_ignore(Parcel, dialect_name="oracle", index_elements=())
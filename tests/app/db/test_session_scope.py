@@ -0,0 +1,22 @@
+import pytest
+from dishka import AsyncContainer
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.src.delivery.services.parcels_service import ParcelService
+from app.src.users.services import UserService
+
+
+@pytest.mark.asyncio
+async def test_session_per_request(container: AsyncContainer):
+    async with container() as first_request:
+        first_session = await first_request.get(AsyncSession)
+        # services of one request share its session
+        user_service = await first_request.get(UserService)
+        parcel_service = await first_request.get(ParcelService)
+        assert user_service.db_session is first_session
+        assert parcel_service.db_session is first_session
+
+    async with container() as second_request:
+        second_session = await second_request.get(AsyncSession)
+
+    assert first_session is not second_session
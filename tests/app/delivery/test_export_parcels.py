@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+from http import HTTPStatus
+from unittest.mock import Mock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.src.delivery.entities import GetParcelResponseDTO
+from app.src.delivery.models import Parcel
+from app.src.users.models import User
+from app.src.users.services import UserService
+
+URL = "/api/v1/delivery/parcels/export"
+
+
+async def handle_request(test_app, export_format: str):
+    async with AsyncClient(
+        transport=ASGITransport(app=test_app),
+        base_url="http://test",
+    ) as ac:
+        return await ac.get(URL, params={"format": export_format})
+
+
+@pytest.mark.asyncio
+async def test_export_unauthorized(test_app):
+    response = await handle_request(test_app, "ndjson")
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson(
+    test_app,
+    random_parcels_for_user: list[Parcel],
+    test_user: User,
+):
+    with patch.object(
+        UserService,
+        "get_session_user_id",
+        new=Mock(return_value=test_user.id),
+    ):
+        response = await handle_request(test_app, "ndjson")
+    assert response.status_code == HTTPStatus.OK
+    got = [
+        GetParcelResponseDTO.model_validate(json.loads(line))
+        for line in response.text.splitlines()
+    ]
+    assert {parcel.id for parcel in got} == {
+        parcel.id for parcel in random_parcels_for_user
+    }
+
+
+@pytest.mark.asyncio
+async def test_export_csv(
+    test_app,
+    random_parcels_for_user: list[Parcel],
+    test_user: User,
+):
+    with patch.object(
+        UserService,
+        "get_session_user_id",
+        new=Mock(return_value=test_user.id),
+    ):
+        response = await handle_request(test_app, "csv")
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == len(random_parcels_for_user)
+    for row in rows:
+        GetParcelResponseDTO.model_validate(row)
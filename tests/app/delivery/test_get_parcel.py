@@ -1,6 +1,6 @@
 from http import HTTPStatus
 from random import choice
-from unittest.mock import AsyncMock, patch
+from unittest.mock import Mock, patch
 
 import pytest
 from httpx import ASGITransport, AsyncClient
@@ -43,8 +43,8 @@ async def test_get_parcel_authorized(
     random_parcel: Parcel = choice(random_parcels_for_user)
     with patch.object(
         UserService,
-        "get_user",
-        new=AsyncMock(return_value=test_user),
+        "get_session_user_id",
+        new=Mock(return_value=test_user.id),
     ):
         response = await handle_request(
             test_app=test_app,
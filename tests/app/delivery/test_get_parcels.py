@@ -1,11 +1,14 @@
+from decimal import Decimal
 from http import HTTPStatus
-from unittest.mock import AsyncMock, patch
+from unittest.mock import Mock, patch
+from uuid import uuid4
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 
 from app.src.delivery.entities import GetParcelResponseDTO
 from app.src.delivery.models import Parcel
+from app.src.delivery.router import NEXT_CURSOR_HEADER
 from app.src.users.models import User
 from app.src.users.services import UserService
 
@@ -37,8 +40,8 @@ async def test_get_parcels_authorized(
 ):
     with patch.object(
         UserService,
-        "get_user",
-        new=AsyncMock(return_value=test_user),
+        "get_session_user_id",
+        new=Mock(return_value=test_user.id),
     ):
         response = await handle_request(test_app=test_app)
     assert response.status_code == HTTPStatus.OK
@@ -48,3 +51,81 @@ async def test_get_parcels_authorized(
     for parcel in got_parcels:
         # Check valid results
         GetParcelResponseDTO.model_validate(parcel)
+
+
+@pytest.mark.asyncio
+async def test_get_parcels_cursor_pagination(
+    test_app,
+    random_parcels_for_user: list[Parcel],
+    test_user: User,
+):
+    got_ids = []
+    params = {"limit": 4}
+    with patch.object(
+        UserService,
+        "get_session_user_id",
+        new=Mock(return_value=test_user.id),
+    ):
+        async with AsyncClient(
+            transport=ASGITransport(app=test_app),
+            base_url="http://test",
+        ) as ac:
+            while True:
+                response = await ac.get(URL, params=params)
+                assert response.status_code == HTTPStatus.OK
+                got_ids.extend(parcel["id"] for parcel in response.json())
+                if not (cursor := response.headers.get(NEXT_CURSOR_HEADER)):
+                    break
+                params["cursor"] = cursor
+
+    assert len(got_ids) == len(set(got_ids))
+    assert set(got_ids) == {
+        str(parcel.id) for parcel in random_parcels_for_user
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_parcels_invalid_cursor(test_app, test_user: User):
+    with patch.object(
+        UserService,
+        "get_session_user_id",
+        new=Mock(return_value=test_user.id),
+    ):
+        async with AsyncClient(
+            transport=ASGITransport(app=test_app),
+            base_url="http://test",
+        ) as ac:
+            response = await ac.get(URL, params={"cursor": "broken"})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_get_parcels_without_type(
+    test_app,
+    session_manager,
+    user_service: UserService,
+):
+    user_id = uuid4()
+    await user_service.ensure_user(user_id)
+    parcel = Parcel(
+        request_id=uuid4(),
+        weight=1,
+        dollar_price=Decimal(1),
+        delivery_price=Decimal(1),
+        user_id=user_id,
+    )
+    async with session_manager.session() as session:
+        session.add(parcel)
+        await session.commit()
+    with patch.object(
+        UserService,
+        "get_session_user_id",
+        new=Mock(return_value=user_id),
+    ):
+        response = await handle_request(test_app=test_app)
+    assert response.status_code == HTTPStatus.OK
+    [got] = [
+        GetParcelResponseDTO.model_validate(item) for item in response.json()
+    ]
+    assert got.id == parcel.id
+    assert got.parcel_type_name is None
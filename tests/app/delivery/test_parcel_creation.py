@@ -2,12 +2,14 @@ from decimal import Decimal
 from http import HTTPStatus
 from random import randint
 from unittest.mock import AsyncMock, patch
+from uuid import uuid4
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 
 from app.src.delivery.entities import RegisterParcelDTO
 from app.src.delivery.models import Parcel, ParcelType
+from app.src.delivery.services.parcels_service import ParcelService
 from app.src.users.models import User
 from app.src.users.services import UserService
 
@@ -50,8 +52,8 @@ async def test_parcel_create(
 ):
     with patch.object(
         UserService,
-        "get_user",
-        new=AsyncMock(return_value=test_user),
+        "get_user_id",
+        new=AsyncMock(return_value=test_user.id),
     ):
         parcel_dto = get_parcel_dto(saved_parcel_type)
         response = await handle_response(
@@ -63,3 +65,91 @@ async def test_parcel_create(
     got_parcel = Parcel.model_validate(response.json())
     for field_name in ("dollar_price", "weight", "parcel_type_id"):
         getattr(got_parcel, field_name) == getattr(parcel_dto, field_name)
+
+
+@pytest.mark.asyncio
+async def test_parcel_create_retry(
+    test_app,
+    test_user: User,
+    saved_parcel_type: ParcelType,
+):
+    parcel_dto = get_parcel_dto(saved_parcel_type)
+    with patch.object(
+        UserService,
+        "get_user_id",
+        new=AsyncMock(return_value=test_user.id),
+    ):
+        response = await handle_response(
+            test_app,
+            parcel_dto,
+            saved_parcel_type,
+        )
+        retried_response = await handle_response(
+            test_app,
+            parcel_dto,
+            saved_parcel_type,
+        )
+    assert response.status_code == HTTPStatus.CREATED
+    assert retried_response.status_code == HTTPStatus.CREATED
+    assert response.json()["id"] == retried_response.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_parcel_create_single_statement(
+    test_app,
+    test_user: User,
+    saved_parcel_type: ParcelType,
+):
+    parcel_dto = get_parcel_dto(saved_parcel_type)
+    with (
+        patch.object(
+            UserService,
+            "get_user_id",
+            new=AsyncMock(return_value=test_user.id),
+        ),
+        patch.object(
+            ParcelService,
+            "check_create_request",
+            autospec=True,
+            side_effect=ParcelService.check_create_request,
+        ) as check_create_request,
+    ):
+        response = await handle_response(
+            test_app,
+            parcel_dto,
+            saved_parcel_type,
+        )
+        # a new parcel is just inserted, no lookup
+        check_create_request.assert_not_awaited()
+        retried_response = await handle_response(
+            test_app,
+            parcel_dto,
+            saved_parcel_type,
+        )
+        check_create_request.assert_awaited_once()
+    assert retried_response.status_code == HTTPStatus.CREATED
+    assert response.json()["id"] == retried_response.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_parcel_create_request_id_of_another_user(
+    test_app,
+    test_user: User,
+    user_service: UserService,
+    saved_parcel_type: ParcelType,
+):
+    other_user_id = uuid4()
+    await user_service.ensure_user(other_user_id)
+    parcel_dto = get_parcel_dto(saved_parcel_type)
+    for user_id in (test_user.id, other_user_id):
+        with patch.object(
+            UserService,
+            "get_user_id",
+            new=AsyncMock(return_value=user_id),
+        ):
+            response = await handle_response(
+                test_app,
+                parcel_dto,
+                saved_parcel_type,
+            )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
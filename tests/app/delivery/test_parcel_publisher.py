@@ -0,0 +1,160 @@
+import asyncio
+from http import HTTPStatus
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from pamqp.commands import Basic
+
+from app.config import Settings
+from app.src.delivery.services.parcel_publisher import (
+    PublisherError,
+    PublisherService,
+)
+
+
+def make_connection():
+    channel = MagicMock(is_closed=False)
+    channel.declare_queue = AsyncMock()
+    channel.default_exchange.publish = AsyncMock(return_value=Basic.Ack())
+    channel.close = AsyncMock()
+    channel.reopen = AsyncMock()
+    connection = MagicMock()
+    connection.channel = AsyncMock(return_value=channel)
+    connection.close = AsyncMock()
+    return connection, channel
+
+
+def connect_to(connection):
+    return patch(
+        "aio_pika.connect_robust",
+        new=AsyncMock(return_value=connection),
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("publisher_confirms", [True, False])
+async def test_publisher_connects_once(
+    settings: Settings,
+    *,
+    publisher_confirms: bool,
+):
+    connection, channel = make_connection()
+    publisher_service = PublisherService(
+        settings=settings.model_copy(
+            update={"rabbitmq_publisher_confirms": publisher_confirms},
+        ),
+    )
+    with connect_to(connection) as connect_robust:
+        await asyncio.gather(
+            *(publisher_service.publish_message(f"{i}") for i in range(5)),
+        )
+        await publisher_service.publish_message("last")
+
+    connect_robust.assert_awaited_once()
+    channel.declare_queue.assert_awaited_once()
+    assert channel.default_exchange.publish.await_count == 6
+    # pooled channels plus the confirm channel
+    assert (
+        connection.channel.await_count
+        <= settings.rabbitmq_publisher_channels + 1
+    )
+
+    await publisher_service.close()
+    connection.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_publisher_reconnects_after_failed_connect(settings: Settings):
+    connection, channel = make_connection()
+    channel.declare_queue.side_effect = [
+        ConnectionError("broker is down"),
+        None,
+    ]
+    publisher_service = PublisherService(settings=settings)
+    with connect_to(connection) as connect_robust:
+        with pytest.raises(ConnectionError):
+            await publisher_service.publish_message("first")
+        await publisher_service.publish_message("second")
+
+    assert connect_robust.await_count == 2
+    connection.close.assert_awaited_once()
+    channel.default_exchange.publish.assert_awaited_once()
+    await publisher_service.close()
+
+
+@pytest.mark.asyncio
+async def test_publisher_reopens_closed_channel(settings: Settings):
+    connection, channel = make_connection()
+    publisher_service = PublisherService(settings=settings)
+    with connect_to(connection):
+        await publisher_service.connect()
+        channel.is_closed = True
+        await publisher_service.publish_message("message")
+
+    channel.reopen.assert_awaited_once()
+    channel.default_exchange.publish.assert_awaited_once()
+    await publisher_service.close()
+
+
+@pytest.mark.asyncio
+async def test_publisher_nack(settings: Settings):
+    connection, channel = make_connection()
+    channel.default_exchange.publish.return_value = Basic.Nack()
+    publisher_service = PublisherService(settings=settings)
+    with connect_to(connection), pytest.raises(PublisherError) as ex:
+        await publisher_service.publish_message("first")
+    assert ex.value.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+
+
+@pytest.mark.asyncio
+async def test_publisher_backpressure(settings: Settings):
+    max_in_flight = 3
+    connection, channel = make_connection()
+    in_flight = 0
+    max_seen = 0
+
+    async def publish(*args, **kwargs):
+        nonlocal in_flight, max_seen
+        in_flight += 1
+        max_seen = max(max_seen, in_flight)
+        # broker confirms later
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return Basic.Ack()
+
+    channel.default_exchange.publish = publish
+    publisher_service = PublisherService(
+        settings=settings.model_copy(
+            update={"rabbitmq_max_in_flight": max_in_flight},
+        ),
+    )
+    with connect_to(connection):
+        await asyncio.gather(
+            *(publisher_service.publish_message(f"{i}") for i in range(10)),
+        )
+    assert max_seen == max_in_flight
+
+
+@pytest.mark.asyncio
+async def test_publisher_cancelled_releases_in_flight(settings: Settings):
+    connection, channel = make_connection()
+    confirmed = asyncio.Event()
+
+    async def publish(*args, **kwargs):
+        await confirmed.wait()
+        return Basic.Ack()
+
+    channel.default_exchange.publish = publish
+    publisher_service = PublisherService(
+        settings=settings.model_copy(update={"rabbitmq_max_in_flight": 1}),
+    )
+    with connect_to(connection):
+        # e.g. the client went away while waiting for the confirm
+        cancelled = asyncio.create_task(publisher_service.publish_message("1"))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        confirmed.set()
+        await asyncio.wait_for(
+            publisher_service.publish_message("2"),
+            timeout=1,
+        )
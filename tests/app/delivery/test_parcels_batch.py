@@ -0,0 +1,192 @@
+from decimal import Decimal
+from http import HTTPStatus
+from random import randint
+from unittest.mock import AsyncMock, patch
+from uuid import UUID, uuid4
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.src.currency.service import ExchangeRateService
+from app.src.delivery.entities import (
+    BatchItemStatus,
+    RegisterParcelDTO,
+    RegisterParcelsBatchItemResponse,
+)
+from app.src.delivery.models import ParcelType
+from app.src.delivery.services.parcels_service import ParcelService
+from app.src.users.services import UserService
+
+URL = "/api/v1/delivery/parcels/batch"
+
+
+async def handle_request(test_app, parcel_dtos: list[RegisterParcelDTO]):
+    async with AsyncClient(
+        transport=ASGITransport(app=test_app),
+        base_url="http://test",
+    ) as ac:
+        return await ac.post(
+            URL,
+            json=[
+                parcel_dto.model_dump(mode="json") for parcel_dto in parcel_dtos
+            ],
+        )
+
+
+@pytest.mark.asyncio
+async def test_parcels_batch_unauthorized(
+    test_app,
+    saved_parcel_type: ParcelType,
+):
+    response = await handle_request(
+        test_app,
+        [RegisterParcelDTO(parcel_type_id=saved_parcel_type.id)],
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_parcels_batch(
+    test_app,
+    user_service: UserService,
+    saved_parcel_type: ParcelType,
+):
+    batch_user_id = uuid4()
+    await user_service.ensure_user(batch_user_id)
+    parcel_dtos = [
+        RegisterParcelDTO(
+            weight=randint(1, 100),
+            dollar_price=Decimal(randint(1, 100)),
+            parcel_type_id=saved_parcel_type.id,
+        )
+        for _ in range(5)
+    ]
+    # retried item inside the same batch
+    parcel_dtos.append(parcel_dtos[0])
+    with (
+        patch.object(
+            UserService,
+            "get_user_id",
+            new=AsyncMock(return_value=batch_user_id),
+        ),
+        patch.object(
+            ExchangeRateService,
+            "get_currency",
+            new=AsyncMock(return_value="100"),
+        ),
+    ):
+        response = await handle_request(test_app, parcel_dtos)
+        retried_response = await handle_request(test_app, parcel_dtos)
+
+    assert response.status_code == HTTPStatus.CREATED
+    got = [
+        RegisterParcelsBatchItemResponse.model_validate(item)
+        for item in response.json()
+    ]
+    assert [item.request_id for item in got] == [
+        parcel_dto.request_id for parcel_dto in parcel_dtos
+    ]
+    assert [item.status for item in got[:-1]] == [BatchItemStatus.CREATED] * 5
+    assert got[-1].status == BatchItemStatus.EXISTING
+    assert got[-1].parcel_id == got[0].parcel_id
+
+    retried = [
+        RegisterParcelsBatchItemResponse.model_validate(item)
+        for item in retried_response.json()
+    ]
+    assert {item.status for item in retried} == {BatchItemStatus.EXISTING}
+    assert [item.parcel_id for item in retried] == [
+        item.parcel_id for item in got
+    ]
+
+
+def make_parcel_dtos(parcel_type: ParcelType) -> list[RegisterParcelDTO]:
+    return [
+        RegisterParcelDTO(
+            weight=randint(1, 100),
+            dollar_price=Decimal(randint(1, 100)),
+            parcel_type_id=parcel_type.id,
+        )
+        for _ in range(3)
+    ]
+
+
+async def handle_user_request(
+    test_app,
+    user_id: UUID,
+    parcel_dtos: list[RegisterParcelDTO],
+):
+    with (
+        patch.object(
+            UserService,
+            "get_user_id",
+            new=AsyncMock(return_value=user_id),
+        ),
+        patch.object(
+            ExchangeRateService,
+            "get_currency",
+            new=AsyncMock(return_value="100"),
+        ),
+    ):
+        return await handle_request(test_app, parcel_dtos)
+
+
+@pytest.mark.asyncio
+async def test_parcels_batch_race(
+    test_app,
+    user_service: UserService,
+    saved_parcel_type: ParcelType,
+):
+    user_id = uuid4()
+    await user_service.ensure_user(user_id)
+    parcel_dtos = make_parcel_dtos(saved_parcel_type)
+    response = await handle_user_request(test_app, user_id, parcel_dtos[:1])
+    check_create_requests = ParcelService.check_create_requests
+    checks = 0
+
+    async def check_late(*args, **kwargs):
+        nonlocal checks
+        checks += 1
+        # the first lookup ran before the concurrent request committed
+        if checks == 1:
+            return {}
+        return await check_create_requests(*args, **kwargs)
+
+    with patch.object(
+        ParcelService,
+        "check_create_requests",
+        autospec=True,
+        side_effect=check_late,
+    ):
+        retried_response = await handle_user_request(
+            test_app,
+            user_id,
+            parcel_dtos,
+        )
+
+    assert retried_response.status_code == HTTPStatus.CREATED
+    got = [
+        RegisterParcelsBatchItemResponse.model_validate(item)
+        for item in retried_response.json()
+    ]
+    assert checks == 2
+    assert got[0].status == BatchItemStatus.EXISTING
+    assert str(got[0].parcel_id) == response.json()[0]["parcel_id"]
+    assert [item.status for item in got[1:]] == [BatchItemStatus.CREATED] * 2
+
+
+@pytest.mark.asyncio
+async def test_parcels_batch_request_id_of_another_user(
+    test_app,
+    user_service: UserService,
+    saved_parcel_type: ParcelType,
+):
+    user_id, other_user_id = uuid4(), uuid4()
+    await user_service.ensure_users({user_id, other_user_id})
+    parcel_dtos = make_parcel_dtos(saved_parcel_type)
+    await handle_user_request(test_app, other_user_id, parcel_dtos)
+
+    response = await handle_user_request(test_app, user_id, parcel_dtos)
+
+    # parcels of another user are never returned as existing
+    assert response.status_code == HTTPStatus.BAD_REQUEST
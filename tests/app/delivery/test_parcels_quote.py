@@ -0,0 +1,93 @@
+from decimal import Decimal
+from http import HTTPStatus
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.src.currency.service import ExchangeRateService
+from app.src.delivery.entities import ParcelQuoteDTO, ParcelQuoteResponse
+from app.src.delivery.models import Parcel
+from app.src.delivery.services.tariffs import DEFAULT_TARIFF
+
+URL = "/api/v1/delivery/parcels/quote"
+# json.loads turns it into inf
+INFINITE_WEIGHT = (
+    '{"weight": 1e309, "dollar_price": "1", "parcel_type_id": "%s"}'
+)
+
+
+async def handle_request(test_app, quote_dtos: list[ParcelQuoteDTO]):
+    async with AsyncClient(
+        transport=ASGITransport(app=test_app),
+        base_url="http://test",
+    ) as ac:
+        return await ac.post(
+            URL,
+            json=[
+                quote_dto.model_dump(mode="json") for quote_dto in quote_dtos
+            ],
+        )
+
+
+@pytest.mark.asyncio
+async def test_parcels_quote(test_app, db_session: AsyncSession):
+    quote_dtos = [
+        ParcelQuoteDTO(
+            weight=weight,
+            dollar_price=Decimal(dollar_price),
+            parcel_type_id=uuid4(),
+        )
+        for weight, dollar_price in ((1, 10), (2.5, 200), (0, 0))
+    ]
+    parcels_before = await db_session.scalar(select(func.count(Parcel.id)))
+    get_currency = AsyncMock(return_value="100")
+    with patch.object(ExchangeRateService, "get_currency", new=get_currency):
+        response = await handle_request(test_app, quote_dtos)
+
+    assert response.status_code == HTTPStatus.OK
+    got = [ParcelQuoteResponse.model_validate(item) for item in response.json()]
+    assert [item.delivery_price for item in got] == [
+        DEFAULT_TARIFF.price(
+            quote_dto.dollar_price,
+            quote_dto.weight,
+            Decimal(100),
+        )
+        for quote_dto in quote_dtos
+    ]
+    # one rate lookup for the whole quote
+    get_currency.assert_awaited_once()
+    parcels_after = await db_session.scalar(select(func.count(Parcel.id)))
+    assert parcels_after == parcels_before
+
+
+@pytest.mark.asyncio
+async def test_parcels_quote_empty(test_app):
+    response = await handle_request(test_app, [])
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("path", "body"),
+    [
+        ("", INFINITE_WEIGHT),
+        ("/batch", f"[{INFINITE_WEIGHT}]"),
+        ("/quote", f"[{INFINITE_WEIGHT}]"),
+        ("/background", INFINITE_WEIGHT),
+    ],
+)
+async def test_parcels_infinite_weight(test_app, path: str, body: str):
+    async with AsyncClient(
+        transport=ASGITransport(app=test_app),
+        base_url="http://test",
+    ) as ac:
+        response = await ac.post(
+            f"/api/v1/delivery/parcels{path}",
+            content=body % uuid4(),
+            headers={"Content-Type": "application/json"},
+        )
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
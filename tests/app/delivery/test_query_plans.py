@@ -0,0 +1,49 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import sqlite
+
+from app.db import DatabaseSessionManager
+from app.src.delivery.entities import GetParcelsFilterParams, ParcelsCursor
+from app.src.delivery.services.parcels_service import ParcelService
+
+FULL_SCAN = "SCAN parcels"
+
+
+async def explain(session_manager: DatabaseSessionManager, statement):
+    compiled = statement.compile(
+        dialect=sqlite.dialect(),
+        compile_kwargs={"literal_binds": True},
+    )
+    async with session_manager.connect() as connection:
+        result = await connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {compiled}",
+        )
+        return [row[-1] for row in result.all()]
+
+
+def hot_statements(parcel_service: ParcelService):
+    user_id = uuid4()
+    cursor = ParcelsCursor(created_at=datetime.now(), id=uuid4()).encode()
+    yield parcel_service.get_parcel_statement(user_id, uuid4())
+    yield parcel_service.get_parcels_statement(
+        user_id,
+        GetParcelsFilterParams(),
+    )
+    yield parcel_service.get_parcels_statement(
+        user_id,
+        GetParcelsFilterParams(cursor=cursor),
+    )
+    yield parcel_service.get_parcels_statement(
+        user_id,
+        GetParcelsFilterParams(page_type=uuid4(), with_delivery_price=True),
+    )
+
+
+@pytest.mark.asyncio
+async def test_hot_queries_use_indexes(request_container, session_manager):
+    parcel_service = await request_container.get(ParcelService)
+    for statement in hot_statements(parcel_service):
+        plan = await explain(session_manager, statement)
+        assert not any(step.startswith(FULL_SCAN) for step in plan), plan
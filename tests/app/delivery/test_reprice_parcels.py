@@ -0,0 +1,59 @@
+from decimal import Decimal
+from random import randint
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import pytest
+from sqlmodel import select
+
+from app.src.currency.service import ExchangeRateService
+from app.src.delivery.models import Parcel, ParcelType
+from app.src.delivery.services.parcels_service import ParcelService
+from app.src.users.services import UserService
+
+USD_PRICE = Decimal(100)
+
+
+@pytest.mark.asyncio
+async def test_reprice_parcels(
+    request_container,
+    session_manager,
+    user_service: UserService,
+    saved_parcel_type: ParcelType,
+):
+    user_id = uuid4()
+    await user_service.ensure_user(user_id)
+    parcels = [
+        Parcel(
+            request_id=uuid4(),
+            weight=randint(1, 100),
+            dollar_price=Decimal(randint(1, 100)),
+            parcel_type_id=saved_parcel_type.id,
+            user_id=user_id,
+        )
+        for _ in range(7)
+    ]
+    async with session_manager.session() as session:
+        session.add_all(parcels)
+        await session.commit()
+    parcel_service = await request_container.get(ParcelService)
+
+    with patch.object(
+        ExchangeRateService,
+        "get_currency",
+        new=AsyncMock(return_value=str(USD_PRICE)),
+    ):
+        repriced = await parcel_service.reprice_parcels(chunk_size=3)
+
+    assert repriced == len(parcels)
+    async with session_manager.session() as session:
+        results = await session.exec(
+            select(Parcel).where(Parcel.user_id == user_id),
+        )
+        saved_parcels = {parcel.id: parcel for parcel in results.all()}
+    for parcel in parcels:
+        expected_price = parcel_service.calculate_delivery_price(
+            parcel,
+            USD_PRICE,
+        )
+        assert saved_parcels[parcel.id].delivery_price == expected_price
@@ -0,0 +1,107 @@
+from decimal import Decimal
+from http import HTTPStatus
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import bindparam, text
+
+from app.src.currency.service import ExchangeRateService
+from app.src.delivery.entities import ParcelQuoteDTO, ParcelQuoteResponse
+from app.src.delivery.models import ParcelType
+from app.src.delivery.services.tariffs import (
+    DEFAULT_TARIFF,
+    Tariff,
+    TariffService,
+)
+
+URL = "/api/v1/delivery/parcels/quote"
+
+
+def test_tariff_price():
+    tariff = Tariff(price_rate=Decimal("0.05"), weight_rate=Decimal(2))
+    assert tariff.price(Decimal(10), 1.5, Decimal(100)) == Decimal("350.00")
+    assert DEFAULT_TARIFF.price(Decimal("0.5"), 0, Decimal(1)) == Decimal(
+        "0.01",
+    )
+
+
+@pytest.mark.asyncio
+async def test_tariffs_refresh(test_app, container, session_manager):
+    tariff_service = await container.get(TariffService)
+    await tariff_service.refresh()
+    parcel_type = ParcelType(
+        name="fragile",
+        price_rate=Decimal("0.05"),
+        weight_rate=Decimal(2),
+    )
+    async with session_manager.session() as session:
+        session.add(parcel_type)
+        await session.commit()
+    try:
+        assert tariff_service.get(parcel_type.id) == DEFAULT_TARIFF
+        assert await tariff_service.refresh()
+        assert not await tariff_service.refresh()
+        assert tariff_service.get(parcel_type.id) == Tariff(
+            price_rate=Decimal("0.05"),
+            weight_rate=Decimal(2),
+        )
+
+        with patch.object(
+            ExchangeRateService,
+            "get_currency",
+            new=AsyncMock(return_value="100"),
+        ):
+            async with AsyncClient(
+                transport=ASGITransport(app=test_app),
+                base_url="http://test",
+            ) as ac:
+                response = await ac.post(
+                    URL,
+                    json=[
+                        ParcelQuoteDTO(
+                            weight=1.5,
+                            dollar_price=Decimal(10),
+                            parcel_type_id=parcel_type.id,
+                        ).model_dump(mode="json"),
+                    ],
+                )
+        assert response.status_code == HTTPStatus.OK
+        got = ParcelQuoteResponse.model_validate(response.json()[0])
+        assert got.delivery_price == Decimal("350.00")
+    finally:
+        async with session_manager.session() as session:
+            await session.delete(parcel_type)
+            await session.commit()
+    assert await tariff_service.refresh()
+    assert tariff_service.get(parcel_type.id) == DEFAULT_TARIFF
+
+
+@pytest.mark.asyncio
+async def test_tariffs_refresh_raw_update(container, session_manager):
+    tariff_service = await container.get(TariffService)
+    parcel_type = ParcelType(name="raw", price_rate=Decimal("0.05"))
+    async with session_manager.session() as session:
+        session.add(parcel_type)
+        await session.commit()
+    try:
+        await tariff_service.refresh()
+        # updated_at stays as is, only the rates tell the change
+        async with session_manager.session() as session:
+            await session.exec(
+                text(
+                    "UPDATE parcel_types SET price_rate = 0.07 WHERE id = :id",
+                ).bindparams(
+                    bindparam("id", type_=ParcelType.__table__.c.id.type),
+                ),
+                params={"id": parcel_type.id},
+            )
+            await session.commit()
+        assert await tariff_service.refresh()
+        assert tariff_service.get(parcel_type.id).price_rate == Decimal(
+            "0.07",
+        )
+    finally:
+        async with session_manager.session() as session:
+            await session.delete(await session.get(ParcelType, parcel_type.id))
+            await session.commit()
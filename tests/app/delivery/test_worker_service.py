@@ -0,0 +1,365 @@
+import asyncio
+import json
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import pytest
+from redis.exceptions import RedisError
+from sqlmodel import select
+
+from app.config import Settings
+from app.src.currency.service import ExchangeRateService
+from app.src.delivery.entities import RegisterParcelWithUserDTO
+from app.src.delivery.models import Parcel, ParcelType
+from app.src.delivery.services.worker_service import (
+    ATTEMPTS_HEADER,
+    BackgroundWorkerError,
+    BackgroundWorkerService,
+)
+
+DEAD_LETTER_QUEUE = "delivery.dead"
+
+
+def make_message(body: str, headers: dict | None = None) -> MagicMock:
+    message = MagicMock(
+        body=body.encode(),
+        headers=headers or {},
+        content_type=None,
+        processed=False,
+    )
+    message.ack = AsyncMock()
+    message.nack = AsyncMock()
+    message.reject = AsyncMock()
+    return message
+
+
+def make_parcel_message(
+    parcel_type: ParcelType | None = None,
+) -> RegisterParcelWithUserDTO:
+    return RegisterParcelWithUserDTO(
+        user_id=uuid4(),
+        parcel_type_id=parcel_type.id if parcel_type else uuid4(),
+        dollar_price=Decimal(10),
+    )
+
+
+def make_worker_service(settings: Settings, **update):
+    worker_service = BackgroundWorkerService(
+        settings=settings.model_copy(update=update),
+    )
+    worker_service.channel = MagicMock()
+    worker_service.channel.default_exchange.publish = AsyncMock()
+    return worker_service
+
+
+def get_routing_keys(worker_service: BackgroundWorkerService) -> list[str]:
+    return [
+        publish_call.kwargs["routing_key"]
+        for publish_call in (
+            worker_service.channel.default_exchange.publish.await_args_list
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_worker_handles_parcel(
+    container,
+    settings: Settings,
+    session_manager,
+    saved_parcel_type: ParcelType,
+):
+    worker_service = BackgroundWorkerService(settings=settings)
+    parcel_message = make_parcel_message(saved_parcel_type)
+    with patch.object(
+        ExchangeRateService,
+        "get_currency",
+        new=AsyncMock(return_value="100"),
+    ):
+        await worker_service.process_message(
+            make_message(parcel_message.model_dump_json()),
+        )
+
+    assert worker_service.handled == 1
+    async with session_manager.session() as session:
+        results = await session.exec(
+            select(Parcel).where(
+                Parcel.request_id == parcel_message.request_id,
+            ),
+        )
+        parcel = results.one()
+    assert parcel.user_id == parcel_message.user_id
+
+
+@pytest.mark.asyncio
+async def test_worker_concurrency(container, settings: Settings):
+    concurrency = 2
+    worker_service = make_worker_service(
+        settings,
+        worker_concurrency=concurrency,
+    )
+    running = 0
+    max_running = 0
+
+    async def handle_parcel(*args, **kwargs):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    with patch.object(worker_service, "handle_parcel", new=handle_parcel):
+        await asyncio.gather(
+            *(
+                worker_service.process_message(
+                    make_message(make_parcel_message().model_dump_json()),
+                )
+                for _ in range(6)
+            ),
+        )
+    assert max_running == concurrency
+    assert worker_service.handled == 6
+
+
+@pytest.mark.asyncio
+async def test_worker_batch(
+    container,
+    settings: Settings,
+    session_manager,
+    saved_parcel_type: ParcelType,
+):
+    worker_service = make_worker_service(settings)
+    parcel_messages = [make_parcel_message(saved_parcel_type) for _ in range(3)]
+    # same user and a redelivered message
+    parcel_messages.append(
+        parcel_messages[0].model_copy(update={"name": "again"}),
+    )
+    messages = [
+        make_message(parcel_message.model_dump_json())
+        for parcel_message in parcel_messages
+    ]
+    invalid_message = make_message("not json")
+    messages.insert(1, invalid_message)
+    for delivery_tag, message in enumerate(messages, start=1):
+        message.delivery_tag = delivery_tag
+
+    with patch.object(
+        ExchangeRateService,
+        "get_currency",
+        new=AsyncMock(return_value="100"),
+    ):
+        await worker_service.process_batch(messages)
+
+    assert get_routing_keys(worker_service) == [DEAD_LETTER_QUEUE]
+    invalid_message.ack.assert_awaited_once_with()
+    messages[-1].ack.assert_awaited_once_with(multiple=True)
+    assert worker_service.handled == len(parcel_messages)
+    async with session_manager.session() as session:
+        results = await session.exec(
+            select(Parcel).where(
+                Parcel.request_id.in_(
+                    [
+                        parcel_message.request_id
+                        for parcel_message in parcel_messages
+                    ],
+                ),
+            ),
+        )
+        parcels = results.all()
+    assert {parcel.user_id for parcel in parcels} == {
+        parcel_message.user_id for parcel_message in parcel_messages
+    }
+    assert len(parcels) == len(parcel_messages) - 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error",
+    [BackgroundWorkerError("db is down"), RedisError("redis is down")],
+)
+async def test_worker_batch_fallback(
+    container,
+    settings: Settings,
+    error: Exception,
+):
+    worker_service = make_worker_service(settings)
+    messages = [
+        make_message(make_parcel_message().model_dump_json()) for _ in range(2)
+    ]
+
+    with (
+        patch.object(
+            worker_service,
+            "parse_batch",
+            new=AsyncMock(
+                return_value=[(message, None) for message in messages],
+            ),
+        ),
+        patch.object(
+            worker_service,
+            "handle_parcels",
+            new=AsyncMock(side_effect=error),
+        ),
+        patch.object(worker_service, "handle_parcel", new=AsyncMock()),
+    ):
+        await worker_service.process_batch(messages)
+        assert worker_service.handle_parcel.await_count == len(messages)
+    for message in messages:
+        message.ack.assert_not_awaited()
+        message.process.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_worker_batch_dead_letter_fails(container, settings: Settings):
+    worker_service = make_worker_service(settings)
+    worker_service.channel.default_exchange.publish.side_effect = (
+        ConnectionError(
+            "broker is down",
+        )
+    )
+    message = make_message("not json")
+
+    await worker_service.process_batch([message])
+
+    # dead-lettered once in the batch, once more one by one
+    assert worker_service.channel.default_exchange.publish.await_count == 2
+    message.process.assert_called_once_with(requeue=True)
+
+
+@pytest.mark.asyncio
+async def test_worker_collects_batches(container, settings: Settings):
+    worker_service = BackgroundWorkerService(
+        settings=settings.model_copy(
+            update={"worker_batch_size": 2, "worker_batch_timeout_ms": 10},
+        ),
+    )
+    with patch.object(
+        worker_service,
+        "process_batch",
+        new=AsyncMock(),
+    ) as process_batch:
+        messages = [make_message(json.dumps({})) for _ in range(3)]
+        for message in messages:
+            await worker_service.collect_message(message)
+        # full batch right away
+        process_batch.assert_awaited_once_with(messages[:2])
+        # the rest after the timeout
+        await asyncio.sleep(0.05)
+        process_batch.assert_awaited_with(messages[2:])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("attempts", "routing_key"),
+    [
+        (0, "delivery.retry.1"),
+        (3, "delivery.retry.4"),
+        (4, DEAD_LETTER_QUEUE),
+    ],
+)
+@pytest.mark.parametrize(
+    "error",
+    [BackgroundWorkerError("db is down"), RuntimeError("unexpected")],
+)
+async def test_worker_retries(
+    container,
+    settings: Settings,
+    attempts: int,
+    routing_key: str,
+    error: Exception,
+):
+    worker_service = make_worker_service(settings, worker_max_attempts=5)
+    message = make_message(
+        make_parcel_message().model_dump_json(),
+        headers={ATTEMPTS_HEADER: attempts},
+    )
+    with patch.object(
+        worker_service,
+        "handle_parcel",
+        new=AsyncMock(side_effect=error),
+    ):
+        await worker_service.process_message(message)
+
+    assert get_routing_keys(worker_service) == [routing_key]
+    published = worker_service.channel.default_exchange.publish.await_args
+    assert published.args[0].headers[ATTEMPTS_HEADER] == attempts + 1
+    assert published.args[0].body == message.body
+    assert worker_service.handled == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "body",
+    [
+        "not json",
+        json.dumps({"weight": 1}),
+        make_parcel_message()
+        .model_dump_json()
+        .replace(
+            '"weight":1.0',
+            '"weight":1e309',
+        ),
+    ],
+)
+async def test_worker_dead_letters_malformed(
+    container,
+    settings: Settings,
+    body: str,
+):
+    worker_service = make_worker_service(settings)
+    with patch.object(worker_service, "handle_parcel", new=AsyncMock()):
+        await worker_service.process_message(make_message(body))
+        worker_service.handle_parcel.assert_not_awaited()
+    assert get_routing_keys(worker_service) == [DEAD_LETTER_QUEUE]
+
+
+@pytest.mark.asyncio
+async def test_worker_declares_retry_queues(container, settings: Settings):
+    worker_service = make_worker_service(
+        settings,
+        worker_max_attempts=4,
+        worker_retry_delay_ms=100,
+    )
+    worker_service.channel.declare_queue = AsyncMock()
+    await worker_service.declare_queues()
+
+    declared = {
+        declare_call.args[0]: declare_call.kwargs.get("arguments")
+        for declare_call in worker_service.channel.declare_queue.await_args_list
+    }
+    assert [
+        declared[f"delivery.retry.{attempt}"]["x-message-ttl"]
+        for attempt in range(1, 4)
+    ] == [100, 200, 400]
+    assert declared["delivery.retry.1"]["x-dead-letter-routing-key"] == (
+        "delivery"
+    )
+    assert DEAD_LETTER_QUEUE in declared
+    assert "delivery" in declared
+
+
+@pytest.mark.asyncio
+async def test_replay_dead_letters(container, settings: Settings):
+    worker_service = make_worker_service(settings)
+    worker_service.channel.declare_queue = AsyncMock()
+    dead_letters = [
+        make_message("{}", headers={ATTEMPTS_HEADER: 5, "x-error": "error"})
+        for _ in range(3)
+    ]
+    dead_letter_queue = MagicMock()
+    dead_letter_queue.get = AsyncMock(side_effect=[*dead_letters, None])
+    worker_service.channel.get_queue = AsyncMock(
+        return_value=dead_letter_queue,
+    )
+
+    with patch.object(worker_service, "open_channel", new=AsyncMock()):
+        assert await worker_service.replay_dead_letters(limit=2) == 2
+        assert await worker_service.replay_dead_letters(limit=10) == 1
+
+    assert get_routing_keys(worker_service) == ["delivery"] * 3
+    for (
+        publish_call
+    ) in worker_service.channel.default_exchange.publish.await_args_list:
+        assert publish_call.args[0].headers == {}
+    for message in dead_letters:
+        message.ack.assert_awaited_once()
@@ -0,0 +1,33 @@
+from http import HTTPStatus
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, Field
+
+from app.exception_handlers import apply_exception_handlers
+
+
+class Item(BaseModel):
+    weight: float = Field(le=100)
+
+
+def test_request_validation_non_finite_input():
+    app = FastAPI()
+    apply_exception_handlers(app=app)
+
+    @app.post("/items")
+    def create_item(item: Item) -> Item:
+        return item
+
+    response = TestClient(app).post(
+        "/items",
+        content='{"weight": 1e309}',
+        headers={"Content-Type": "application/json"},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    [error] = response.json()["detail"]
+    assert error["loc"] == ["body", "weight"]
+    assert error["input"] == "inf"
+    # finite floats are kept as numbers
+    assert error["ctx"] == {"le": 100.0}
@@ -0,0 +1,28 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID, uuid4
+
+from pydantic import BaseModel
+
+from app.responses import FastJSONResponse
+
+
+class Item(BaseModel):
+    id: UUID
+    price: Decimal
+    created_at: datetime
+
+
+def test_fast_json_response_types():
+    item = Item(id=uuid4(), price=Decimal("10.05"), created_at=datetime.now())
+
+    got = json.loads(FastJSONResponse([item]).body)
+
+    assert got == [
+        {
+            "id": str(item.id),
+            "price": "10.05",
+            "created_at": item.created_at.isoformat(),
+        },
+    ]
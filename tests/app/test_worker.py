@@ -0,0 +1,33 @@
+from unittest.mock import MagicMock, patch
+
+from app import worker
+from app.worker import RESTART_DELAY, WorkerProcess
+
+
+def test_worker_process_restart_delay():
+    crashed = WorkerProcess(
+        process=MagicMock(is_alive=MagicMock(return_value=False)),
+        started_at=100,
+    )
+    alive = WorkerProcess(process=MagicMock(), started_at=100)
+    restarted = WorkerProcess(process=MagicMock())
+
+    with (
+        patch.object(worker.time, "monotonic", return_value=101),
+        patch.object(WorkerProcess, "start", return_value=restarted),
+    ):
+        # crashed right after the start, waits without blocking the others
+        assert crashed.poll() is crashed
+        assert alive.poll() is alive
+        WorkerProcess.start.assert_not_called()
+    assert crashed.restart_at == 100 + RESTART_DELAY
+
+    with (
+        patch.object(
+            worker.time,
+            "monotonic",
+            return_value=100 + RESTART_DELAY,
+        ),
+        patch.object(WorkerProcess, "start", return_value=restarted),
+    ):
+        assert crashed.poll() is restarted
@@ -0,0 +1,46 @@
+from http import HTTPStatus
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.src.users.models import User
+from app.src.users.services import (
+    USER_ID_KEY,
+    NotAuthorizedError,
+    UserService,
+)
+
+
+@pytest.mark.asyncio
+async def test_get_user_id_provisions_once(
+    user_service: UserService,
+    session_manager,
+):
+    user_id = uuid4()
+    session = {USER_ID_KEY: str(user_id)}
+
+    assert await user_service.get_user_id(session) == user_id
+    async with session_manager.session() as db_session:
+        assert await db_session.get(User, user_id)
+
+    # known user, no db round trip
+    with patch.object(AsyncSession, "exec", new=AsyncMock()) as exec_mock:
+        assert await user_service.get_user_id(session) == user_id
+    exec_mock.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_ensure_user_existing(user_service: UserService, test_user):
+    # e.g. provisioned by another process, insert is ignored
+    user_service.known_users.clear()
+    await user_service.ensure_user(test_user.id)
+    assert user_service.known_users.get(test_user.id)
+
+
+@pytest.mark.parametrize("session", [{}, {USER_ID_KEY: "not-uuid"}])
+def test_get_session_user_id_unauthorized(session: dict):
+    with pytest.raises(NotAuthorizedError) as ex:
+        UserService.get_session_user_id(session)
+    assert ex.value.status_code == HTTPStatus.UNAUTHORIZED
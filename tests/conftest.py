@@ -68,19 +68,26 @@ async def session_manager(container: AsyncContainer):
 
 
 @pytest_asyncio.fixture
-async def db_session(container: AsyncContainer):
-    yield await container.get(AsyncSession)
+async def request_container(container: AsyncContainer):
+    async with container() as request_container:
+        yield request_container
 
 
 @pytest_asyncio.fixture
-async def user_service(container: AsyncContainer):
-    yield await container.get(UserService)
+async def db_session(request_container: AsyncContainer):
+    yield await request_container.get(AsyncSession)
 
 
 @pytest_asyncio.fixture
-async def test_user(user_service: UserService) -> User:
-    user = await user_service.get_or_create(user_id=TEST_USER_ID)
-    return user
+async def user_service(request_container: AsyncContainer):
+    yield await request_container.get(UserService)
+
+
+@pytest_asyncio.fixture
+async def test_user(user_service: UserService, db_session) -> User:
+    await user_service.ensure_user(TEST_USER_ID)
+    async with db_session as session:
+        return await session.get(User, TEST_USER_ID)
 
 
 @pytest.fixture
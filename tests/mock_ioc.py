@@ -1,17 +1,10 @@
-from typing import AsyncIterable
-
 import fakeredis
 from dishka import Scope, provide
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
-from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.config import Settings
-from app.db import DatabaseSessionManager
 from app.ioc import AppProvider
-from app.src.users.services import UserService
-
-# Have to change scope to Scope.APP
 
 
 class MockConnectionProvider(AppProvider):
@@ -25,22 +18,7 @@ class MockConnectionProvider(AppProvider):
 
     @provide(scope=Scope.APP)
     async def get_engine(self, settings: Settings) -> AsyncEngine:
+        # in-memory sqlite shares a single connection, pool options don't apply
         database_url = "sqlite+aiosqlite:///"
 
         return create_async_engine(database_url)
-
-    @provide(scope=Scope.APP)
-    async def db_session(
-        self,
-        session_manager: DatabaseSessionManager,
-    ) -> AsyncIterable[AsyncSession]:
-        async with session_manager.session() as session:
-            yield session
-
-    @provide(scope=Scope.APP)
-    async def user_service(
-        self,
-        db_session: AsyncSession,
-        settings: Settings,
-    ) -> AsyncIterable[UserService]:
-        yield UserService(db_session=db_session, settings=settings)